@@ -1,60 +1,310 @@
-from flask import Flask, request, jsonify
+import os
+from functools import wraps
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS  
-from models.recommend_recipes import find_most_similar_recipe
-from models.create_recipe_ai import create_recipe_from_ingredients
-from models.find_similar_recipes import find_similar_recipe_flow
+from models.recommend_recipes import find_most_similar_recipe, generate_validated_gpt_recipe, gpt_recipe_job
+from models.create_recipe_ai import (
+    find_closest_recipe, retrieval_modes, stored_recipe_response, generated_recipe_response, generated_recipe_job
+)
+from models.find_similar_recipes import find_similar_recipe_flow, explain_similarity, explain_similarity_in_english
+# Same import path as create_recipe_ai, so the pantry index is loaded once
+from src.models.pantry_search import find_recipes_by_pantry, parse_pantry_options
+from src.models.nutrition_index import resolve_nutrition_constraints, parse_nutrition_constraints
+from src.models.review_aggregates import parse_rating_weight
+from src.utils.response_cache import ResponseCache, normalize_ingredients
+from src.utils.upstream import UpstreamError, upstream_stats
+from src.utils.jobs import JobQueue, JobQueueFull
+from src.utils.profiling import register_profiling
+from src.utils.admission import admit, admission_stats, Overloaded
+from src.models.vector_search import start_vector_backend
 
 app = Flask(__name__)
 CORS(app)  
 
+# Sharded search workers are started at import, under `python app.py` as under a
+# WSGI server, so they are never started from a request thread
+start_vector_backend()
+
+# Sampling profiler and memory introspection, only when PROFILING_ENABLED=1
+register_profiling(app)
+
+# Full-response cache, invalidated when a new embedding-index version is published
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", 1024)),
+    shared_url=os.getenv("RESPONSE_CACHE_URL"),
+    shared_ttl=int(os.getenv("RESPONSE_CACHE_TTL", 3600)),
+    local_ttl=int(os.getenv("RESPONSE_CACHE_LOCAL_TTL", os.getenv("RESPONSE_CACHE_TTL", 3600)))
+)
+
+# Deferred GPT enrichment for requests sent with "async": true
+job_queue = JobQueue(
+    num_workers=int(os.getenv("JOB_WORKERS", 4)),
+    max_queued=int(os.getenv("JOB_QUEUE_SIZE", 256)),
+    result_ttl=int(os.getenv("JOB_RESULT_TTL", 600))
+)
+
+# Lower runs first: recipe generation before similarity explanations
+RECIPE_JOB_PRIORITY = 1
+EXPLANATION_JOB_PRIORITY = 5
+
+def degraded_response(body):
+    """
+    Retrieval-only answer used when the generation bulkhead is full. It is marked
+    "degraded" and never cached, so the full answer is served once load drops.
+    """
+    g.degraded = True
+    if isinstance(body, dict):
+        body["degraded"] = True
+    return jsonify(body), 200
+
+def is_fallback(body):
+    """
+    True for bodies (or lists of them) served from a stored fallback because GPT
+    was unavailable. They must not outlive the outage in the cache.
+    """
+    bodies = body if isinstance(body, list) else [body]
+    return any(isinstance(item, dict) and item.get('fallback') for item in bodies)
+
+def cached_response(view):
+    """
+    Serve a view from the response cache. Requests opt out with "cache": false in the
+    payload or a 'Cache-Control: no-cache' header; only successful responses that are
+    neither degraded nor a GPT fallback are stored.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        payload = request.get_json(silent=True) or {}
+        cache_control = request.headers.get('Cache-Control', '')
+        if payload.get('cache') is False or 'no-cache' in cache_control or 'no-store' in cache_control:
+            response_cache.record_bypass()
+            return view(*args, **kwargs)
+
+        key = response_cache.make_key(request.path, payload)
+        cached = response_cache.get(key)
+        if cached is not None:
+            body, status = cached
+            return jsonify(body), status
+
+        response, status = view(*args, **kwargs)
+        # 202 responses carry a job ID that expires, so they are never cached
+        body = response.get_json()
+        if status in (200, 201) and not g.get('degraded') and not is_fallback(body):
+            response_cache.set(key, (body, status))
+        return response, status
+    return wrapper
+
 @app.route('/')
 def home():
     return jsonify({"message": "Welcome to AICook: Recipe Intelligent Assistant!"}), 200
 
 @app.route('/recommend', methods=['POST'])
+@cached_response
 def recommend():
-    user_ingredients = request.json.get('ingredients')
+    # Same form as the cache key, so cached and computed answers agree
+    user_ingredients = normalize_ingredients(request.json.get('ingredients'))
     if not user_ingredients:
         return jsonify({"error": "No ingredients provided"}), 400
 
-    best_recipe = find_most_similar_recipe(user_ingredients)
+    deferred = request.json.get('async', False)
+    try:
+        best_recipe = find_most_similar_recipe(
+            user_ingredients,
+            rating_weight=parse_rating_weight(request.json.get('rating_weight')),
+            nutrition=request.json.get('nutrition'),
+            generate=False
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if best_recipe and deferred:
+        # Return the retrieval result now, the GPT recipe is polled at /jobs/<job_id>.
+        # The job gets its own copy, best_recipe is serialized below while it runs.
+        try:
+            job_id = job_queue.submit(gpt_recipe_job, dict(best_recipe), priority=RECIPE_JOB_PRIORITY)
+        except JobQueueFull as e:
+            return jsonify({"error": str(e)}), 503
+        return jsonify({"recipes": [best_recipe], "job_id": job_id}), 202
+
     if best_recipe:
+        try:
+            with admit("generation"):
+                best_recipe['gpt_recipe'] = generate_validated_gpt_recipe(best_recipe)
+        except Overloaded as e:
+            print(f"Serving /recommend without generation: {e}")
+            best_recipe['degraded'] = True
+            return degraded_response([best_recipe])
         return jsonify([best_recipe]), 200  
     else:
         return jsonify([]), 404 
 
 @app.route('/create', methods=['POST'])
+@cached_response
 def create():
     try:
         # Get the ingredients from the request body
-        ingredients = request.json.get('ingredients')
+        ingredients = normalize_ingredients(request.json.get('ingredients'))
         if not ingredients:
             return jsonify({"error": "No ingredients provided"}), 400
 
-        # Call the function to create the recipe
-        recipe_response = create_recipe_from_ingredients(ingredients)
-        if "error" in recipe_response:
-            return jsonify({"message": recipe_response["error"]}), 404
+        retrieval_options = dict(
+            retrieval_mode=request.json.get('mode', 'vector'),  # "vector" or "pantry" retrieval
+            min_coverage=request.json.get('min_coverage', 0.5),
+            max_missing=request.json.get('max_missing'),
+            rating_weight=request.json.get('rating_weight', 0.0),
+            nutrition=request.json.get('nutrition')
+        )
+        try:
+            if retrieval_options['retrieval_mode'] not in retrieval_modes:
+                raise ValueError(f"mode must be one of {', '.join(retrieval_modes)}")
+            retrieval_options['min_coverage'], retrieval_options['max_missing'], _ = parse_pantry_options(
+                retrieval_options['min_coverage'], retrieval_options['max_missing']
+            )
+            retrieval_options['rating_weight'] = parse_rating_weight(retrieval_options['rating_weight'])
+            parse_nutrition_constraints(retrieval_options['nutrition'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        if request.json.get('async', False):
+            # Return the closest stored recipe now, the GPT recipe is polled at /jobs/<job_id>
+            closest_recipe = find_closest_recipe(ingredients, **retrieval_options)
+            if "error" in closest_recipe:
+                return jsonify({"message": closest_recipe["error"]}), 404
+            try:
+                job_id = job_queue.submit(generated_recipe_job, ingredients, closest_recipe,
+                                          priority=RECIPE_JOB_PRIORITY)
+            except JobQueueFull as e:
+                return jsonify({"error": str(e)}), 503
+            return jsonify({"recipe": stored_recipe_response(closest_recipe), "job_id": job_id}), 202
+
+        # Call the functions to create the recipe: retrieval, then generation
+        closest_recipe = find_closest_recipe(ingredients, **retrieval_options)
+        if "error" in closest_recipe:
+            return jsonify({"message": closest_recipe["error"]}), 404
+        try:
+            with admit("generation"):
+                recipe_response = generated_recipe_response(ingredients, closest_recipe)
+        except Overloaded as e:
+            print(f"Serving /create without generation: {e}")
+            return degraded_response(stored_recipe_response(closest_recipe))
 
         # Return the generated recipe
         return jsonify(recipe_response), 201
 
+    except UpstreamError as e:
+        print(f"Upstream unavailable for /create: {e}")
+        return jsonify({"error": str(e)}), 503
+
+    except Overloaded:
+        # Handled by the app-wide 503 handler below
+        raise
+
     except Exception as e:
         print(f"Error processing /create: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/pantry', methods=['POST'])
+def pantry():
+    ingredients = normalize_ingredients(request.json.get('ingredients'))
+    if not ingredients:
+        return jsonify({"error": "No ingredients provided"}), 400
+
+    try:
+        min_coverage, max_missing, top_n = parse_pantry_options(
+            request.json.get('min_coverage', 0.0),
+            request.json.get('max_missing'),
+            request.json.get('top_n', 20)
+        )
+        candidate_mask = resolve_nutrition_constraints(request.json.get('nutrition'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Recipes of the whole corpus that can be cooked with what the user has
+    recipes = find_recipes_by_pantry(
+        ingredients,
+        min_coverage=min_coverage,
+        max_missing=max_missing,
+        top_n=top_n,
+        candidate_mask=candidate_mask
+    )
+    if recipes:
+        return jsonify(recipes), 200
+    else:
+        return jsonify([]), 404
+
+
 @app.route('/find_similar', methods=['POST'])
+@cached_response
 def find_similar():
     recipe_name = request.json.get('recipe_name')
     if not recipe_name:
         return jsonify({"error": "No recipe name provided"}), 400
 
-    similar_recipes = find_similar_recipe_flow(recipe_name)
+    deferred = request.json.get('async', False)
+    # The explanation is generated here, under the generation bulkhead, or deferred
+    similar_recipes = find_similar_recipe_flow(recipe_name, explain=False)
+    if similar_recipes and similar_recipes['matches']:
+        similar_recipe_name = similar_recipes['matches'][0]['metadata'].get('name', 'Recipe')
+        if not deferred:
+            try:
+                with admit("generation"):
+                    similar_recipes['explanation'], fallback = explain_similarity(recipe_name, similar_recipe_name)
+                if fallback:
+                    similar_recipes['fallback'] = True
+            except Overloaded as e:
+                print(f"Serving /find_similar without generation: {e}")
+                return degraded_response(similar_recipes)
+
+    if similar_recipes and deferred and similar_recipes['matches']:
+        # Return the neighbours now, the explanation is polled at /jobs/<job_id>
+        try:
+            similar_recipes['job_id'] = job_queue.submit(explain_similarity_in_english, recipe_name, similar_recipe_name,
+                                                         priority=EXPLANATION_JOB_PRIORITY)
+        except JobQueueFull as e:
+            return jsonify({"error": str(e)}), 503
+        return jsonify(similar_recipes), 202
+
     if similar_recipes:
         return jsonify(similar_recipes), 200
     else:
         return jsonify({"message": "No similar recipes found."}), 404
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    # ?wait=N long-polls for up to N seconds until the job finishes
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0.0), 30.0)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    job = job_queue.get(job_id, wait=wait)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job), 200
+
+@app.route('/stats/cache')
+def cache_stats():
+    return jsonify(response_cache.stats()), 200
+
+@app.route('/stats/jobs')
+def job_stats():
+    return jsonify(job_queue.stats()), 200
+
+@app.route('/stats/upstream')
+def upstream_latency_stats():
+    return jsonify(upstream_stats()), 200
+
+@app.route('/stats/admission')
+def admission_queue_stats():
+    return jsonify(admission_stats()), 200
+
+@app.errorhandler(UpstreamError)
+def upstream_unavailable(e):
+    return jsonify({"error": str(e)}), 503
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    # Embedding or retrieval is saturated: fail fast and let the client retry
+    return jsonify({"error": str(e), "stage": e.stage}), 503, {"Retry-After": "1"}
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,137 @@
+import os
+import sys
+import glob
+import hashlib
+import tempfile
+import zipfile
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Same archive as download_data.py, or a local copy of it for offline use
+url = 'https://drive.google.com/uc?id=1ygPlCrpyLU5N4fTTOL2p88cnwfX9kz-C'
+
+recipes_dataset_path = "data/partitioned/recipes"
+reviews_dataset_path = "data/partitioned/reviews"
+
+# RecipeId range covered by each partition directory (id_bucket=N)
+ID_BUCKET_SIZE = 50_000
+# Large enough for efficient scans, small enough for row-group pruning to matter
+ROW_GROUP_SIZE = 64 * 1024
+READ_BATCH_SIZE = 64 * 1024
+
+def fetch_archive(source):
+    """
+    Return a local path for the archive: the source itself if it's a local file,
+    otherwise a temporary download. The second value tells if it must be deleted.
+    """
+    if os.path.exists(source):
+        return source, False
+
+    import gdown
+    fd, path = tempfile.mkstemp(suffix=".zip")
+    os.close(fd)
+    print("Downloading data...")
+    gdown.download(source, path, quiet=False)
+    return path, True
+
+def sha256_of(path, chunk_size=1 << 20):
+    """
+    SHA-256 of a file, read in chunks so the archive is never loaded in memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def verify_checksum(path, expected_sha256):
+    digest = sha256_of(path)
+    print(f"Archive SHA-256: {digest}")
+    if expected_sha256 and digest != expected_sha256.lower():
+        raise ValueError(f"Checksum mismatch: expected {expected_sha256}, got {digest}")
+
+def iter_member_batches(archive, member_name, columns=None):
+    """
+    Stream record batches of a parquet file inside the zip archive without
+    extracting it. Parquet members are usually stored uncompressed in the zip,
+    which keeps the seeks parquet needs cheap.
+    """
+    with zipfile.ZipFile(archive) as zip_ref:
+        name = next(name for name in zip_ref.namelist() if name.endswith(member_name))
+        with zip_ref.open(name) as member:
+            parquet_file = pq.ParquetFile(member)
+            yield parquet_file.schema_arrow
+            for batch in parquet_file.iter_batches(batch_size=READ_BATCH_SIZE, columns=columns):
+                yield batch
+
+def _bucketed_batches(batches):
+    for batch in batches:
+        table = pa.Table.from_batches([batch])
+        buckets = pc.cast(pc.divide(pc.cast(table["RecipeId"], pa.int64()), ID_BUCKET_SIZE), pa.int32())
+        for bucketed_batch in table.append_column("id_bucket", buckets).to_batches():
+            yield bucketed_batch
+
+def sort_partitions(output_path, file_options):
+    """
+    Rewrite every partition sorted by RecipeId, so each row group covers a narrow
+    RecipeId range and its min/max statistics prune well even for files, like the
+    reviews, that aren't ordered by RecipeId. Only one partition is held in memory.
+    """
+    for partition in sorted(glob.glob(os.path.join(output_path, "id_bucket=*"))):
+        files = sorted(glob.glob(os.path.join(partition, "*.parquet")))
+        table = ds.dataset(files, format="parquet").to_table().sort_by("RecipeId")
+        ds.write_dataset(
+            table,
+            partition,
+            format="parquet",
+            file_options=file_options,
+            basename_template="sorted-{i}.parquet",
+            min_rows_per_group=ROW_GROUP_SIZE,
+            max_rows_per_group=ROW_GROUP_SIZE,
+            existing_data_behavior="overwrite_or_ignore"
+        )
+        for path in files:
+            os.remove(path)
+
+def write_partitioned_dataset(archive, member_name, output_path):
+    """
+    Rewrite one parquet member of the archive as a dataset partitioned by RecipeId
+    range, sorted by RecipeId within each partition, with tuned row groups, zstd
+    compression and column statistics.
+    """
+    batches = iter_member_batches(archive, member_name)
+    schema = next(batches).append(pa.field("id_bucket", pa.int32()))
+
+    file_options = ds.ParquetFileFormat().make_write_options(compression="zstd", write_statistics=True)
+    ds.write_dataset(
+        _bucketed_batches(batches),
+        output_path,
+        schema=schema,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("id_bucket", pa.int32())]), flavor="hive"),
+        file_options=file_options,
+        min_rows_per_group=ROW_GROUP_SIZE,
+        max_rows_per_group=ROW_GROUP_SIZE,
+        existing_data_behavior="delete_matching"
+    )
+    sort_partitions(output_path, file_options)
+    print(f"'{member_name}' written to '{output_path}'")
+
+def ingest(source=url, expected_sha256=None):
+    archive, temporary = fetch_archive(source)
+    try:
+        verify_checksum(archive, expected_sha256)
+        write_partitioned_dataset(archive, "recipes.parquet", recipes_dataset_path)
+        write_partitioned_dataset(archive, "reviews.parquet", reviews_dataset_path)
+    finally:
+        if temporary:
+            os.remove(archive)
+    print("Data ingested successfully!")
+
+if __name__ == "__main__":
+    # python src/data/ingest_data.py [local archive or URL] [expected SHA-256]
+    source = sys.argv[1] if len(sys.argv) > 1 else url
+    expected_sha256 = sys.argv[2] if len(sys.argv) > 2 else os.getenv("DATA_SHA256")
+    ingest(source, expected_sha256)
@@ -1,12 +1,32 @@
+import os
 import pandas as pd
 
 #Path from data
 recipes_path = "data/raw/recipes.parquet"
 review_path = "data/raw/reviews.parquet"
 
+# Partitioned datasets written by ingest_data.py, used when present
+recipes_dataset_path = "data/partitioned/recipes"
+reviews_dataset_path = "data/partitioned/reviews"
+
+def read_dataset(dataset_path, raw_path, columns=None, filters=None):
+    """
+    Read the partitioned dataset when it exists, so 'columns' and 'filters'
+    (e.g. [('RecipeId', '<', 1000)]) only read what is needed, else the raw file.
+    Partitions come back in directory order, so partitioned rows are sorted by
+    RecipeId when it was read.
+    """
+    if os.path.isdir(dataset_path):
+        data = pd.read_parquet(dataset_path, columns=columns, filters=filters)
+        data = data.drop(columns=['id_bucket'], errors='ignore')
+        if 'RecipeId' in data.columns:
+            data = data.sort_values('RecipeId', kind='stable', ignore_index=True)
+        return data
+    return pd.read_parquet(raw_path, columns=columns, filters=filters)
+
 def load_parquet_data():
-    recipes_raw = pd.read_parquet(recipes_path)
-    review_raw = pd.read_parquet(review_path)
+    recipes_raw = read_dataset(recipes_dataset_path, recipes_path)
+    review_raw = read_dataset(reviews_dataset_path, review_path)
 
     print("Recipes data loaded. Number of recipes:", recipes_raw.shape[0])
     print("Reviews data loaded. Number of Reviews:", review_raw.shape[0])
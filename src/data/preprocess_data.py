@@ -1,14 +1,19 @@
+import os
+import sys
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
 import pandas as pd
 import random
 import re
 import ast
+from src.data.load_data import read_dataset, recipes_dataset_path, recipes_path
 
-recipes_path = "data/raw/recipes.parquet"
-
-def load_data():
-
-    recipes_raw = pd.read_parquet(recipes_path)
-    return recipes_raw
+def load_data(columns=None, filters=None):
+    """
+    Load the raw recipes, preferring the partitioned dataset (see read_dataset).
+    """
+    return read_dataset(recipes_dataset_path, recipes_path, columns=columns, filters=filters)
 
 def convert_iso8601_duration_to_minutes(duration):
     """
@@ -0,0 +1,267 @@
+import os
+import sys
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import time
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from src.models.vector_search import load_embedding_matrix, normalize_query
+from src.utils.index_version import current_index_version, publish_index_version
+
+try:
+    import hnswlib
+except ImportError:  # Only needed for the HNSW option
+    hnswlib = None
+
+hnsw_index_path = "data/processed/ann_hnsw.bin"
+ivfpq_index_path = "data/processed/ann_ivfpq.npz"
+
+# "hnsw" (graph) or "ivfpq" (inverted file + product quantization)
+ANN_METHOD = os.getenv("ANN_METHOD", "hnsw")
+# Search-time effort: candidate list size for HNSW, probed lists for IVF-PQ
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", 64))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 16))
+
+_ann_index = None
+_ann_index_version = None
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small-world graph over normalized embeddings (hnswlib),
+    labelled directly with RecipeIds.
+    """
+
+    def __init__(self, dim, M=16, ef_construction=200, ef_search=ANN_EF_SEARCH):
+        if hnswlib is None:
+            raise ImportError("The HNSW index requires hnswlib (pip install hnswlib).")
+        self.dim = dim
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.index = hnswlib.Index(space='ip', dim=dim)
+
+    def build(self, recipe_ids, vectors):
+        self.index.init_index(max_elements=len(recipe_ids), ef_construction=self.ef_construction, M=self.M)
+        self.index.add_items(vectors, np.asarray(recipe_ids, dtype=np.int64))
+
+    def add(self, recipe_ids, vectors):
+        """
+        Insert new recipes, or update the vectors of existing ones, without a rebuild.
+        """
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        # Existing labels are updated in place, only new ones need capacity
+        new_labels = ~np.isin(recipe_ids, np.asarray(self.index.get_ids_list(), dtype=np.int64))
+        needed = self.index.get_current_count() + int(new_labels.sum())
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(int(needed * 1.25))
+        self.index.add_items(vectors, recipe_ids)
+
+    def search(self, query, top_k, ef_search=None):
+        self.index.set_ef(max(ef_search or self.ef_search, top_k))
+        top_k = min(top_k, self.index.get_current_count())
+        labels, distances = self.index.knn_query(query, k=top_k)
+        # The 'ip' space returns 1 - inner product
+        return [(float(1 - distance), int(label)) for label, distance in zip(labels[0], distances[0])]
+
+    def save(self, path=hnsw_index_path):
+        self.index.save_index(path)
+
+    @classmethod
+    def load(cls, dim, path=hnsw_index_path):
+        hnsw = cls(dim)
+        hnsw.index.load_index(path, max_elements=0)
+        return hnsw
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product-quantized residuals. Vectors are assigned to
+    their nearest of 'nlist' coarse centroids and the residual is encoded with 'm'
+    sub-quantizers of 256 centroids each (one byte per sub-vector). Queries scan
+    the 'nprobe' closest lists with precomputed inner-product lookup tables.
+    """
+
+    def __init__(self, nlist=1024, m=48, nprobe=ANN_NPROBE):
+        self.nlist = nlist
+        self.m = m
+        self.nprobe = nprobe
+        self.centroids = None
+        self.codebooks = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.lists = np.empty(0, dtype=np.int32)
+        self.codes = np.empty((0, m), dtype=np.uint8)
+        self._order = None
+        self._offsets = None
+
+    def train(self, vectors, sample_size=100_000, seed=0):
+        dim = vectors.shape[1]
+        if dim % self.m:
+            raise ValueError(f"Embedding dimension {dim} is not divisible by m={self.m}")
+
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))])
+
+        self.nlist = min(self.nlist, len(sample))
+        coarse = MiniBatchKMeans(n_clusters=self.nlist, random_state=seed, n_init=3).fit(sample)
+        self.centroids = coarse.cluster_centers_.astype(np.float32)
+
+        residuals = sample - self.centroids[self._assign(sample)]
+        dsub = dim // self.m
+        ksub = min(256, len(sample))
+        self.codebooks = np.zeros((self.m, 256, dsub), dtype=np.float32)
+        for j in range(self.m):
+            subspace = residuals[:, j * dsub:(j + 1) * dsub]
+            quantizer = MiniBatchKMeans(n_clusters=ksub, random_state=seed, n_init=1).fit(subspace)
+            self.codebooks[j, :ksub] = quantizer.cluster_centers_
+
+    def _assign(self, vectors, batch_size=65536):
+        centroid_norms = (self.centroids ** 2).sum(axis=1)
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            assignments[start:start + len(batch)] = np.argmin(centroid_norms - 2 * batch @ self.centroids.T, axis=1)
+        return assignments
+
+    def _encode(self, residuals):
+        dsub = residuals.shape[1] // self.m
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codebook = self.codebooks[j]
+            subspace = residuals[:, j * dsub:(j + 1) * dsub]
+            distances = (codebook ** 2).sum(axis=1) - 2 * subspace @ codebook.T
+            codes[:, j] = np.argmin(distances, axis=1)
+        return codes
+
+    def add(self, recipe_ids, vectors, batch_size=65536):
+        """
+        Encode and append vectors; recipes already in the index are replaced.
+        """
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        keep = ~np.isin(self.ids, recipe_ids)
+        ids, lists, codes = [self.ids[keep]], [self.lists[keep]], [self.codes[keep]]
+
+        for start in range(0, len(recipe_ids), batch_size):
+            batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            assignments = self._assign(batch)
+            ids.append(recipe_ids[start:start + len(batch)])
+            lists.append(assignments)
+            codes.append(self._encode(batch - self.centroids[assignments]))
+
+        self.ids = np.concatenate(ids)
+        self.lists = np.concatenate(lists)
+        self.codes = np.concatenate(codes)
+        self._order = None
+
+    def build(self, recipe_ids, vectors):
+        self.train(vectors)
+        self.add(recipe_ids, vectors)
+
+    def _inverted_lists(self):
+        # Group entries by list lazily, so batches of inserts pay for one sort
+        if self._order is None:
+            self._order = np.argsort(self.lists, kind='stable')
+            self._offsets = np.searchsorted(self.lists[self._order], np.arange(self.nlist + 1))
+        return self._order, self._offsets
+
+    def search(self, query, top_k, nprobe=None):
+        order, offsets = self._inverted_lists()
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        centroid_scores = self.centroids @ query
+        coarse_distances = (self.centroids ** 2).sum(axis=1) - 2 * centroid_scores
+        probes = np.argpartition(coarse_distances, nprobe - 1)[:nprobe]
+
+        dsub = len(query) // self.m
+        tables = np.einsum('jkd,jd->jk', self.codebooks, query.reshape(self.m, dsub))
+
+        candidates = np.concatenate([order[offsets[probe]:offsets[probe + 1]] for probe in probes])
+        if candidates.size == 0:
+            return []
+        scores = centroid_scores[self.lists[candidates]] + tables[np.arange(self.m), self.codes[candidates]].sum(axis=1)
+
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(float(scores[i]), int(self.ids[candidates[i]])) for i in best]
+
+    def save(self, path=ivfpq_index_path):
+        np.savez(path, nlist=self.nlist, m=self.m, centroids=self.centroids, codebooks=self.codebooks,
+                 ids=self.ids, lists=self.lists, codes=self.codes)
+
+    @classmethod
+    def load(cls, path=ivfpq_index_path):
+        with np.load(path) as data:
+            ivfpq = cls(nlist=int(data['nlist']), m=int(data['m']))
+            ivfpq.centroids = data['centroids']
+            ivfpq.codebooks = data['codebooks']
+            ivfpq.ids = data['ids']
+            ivfpq.lists = data['lists']
+            ivfpq.codes = data['codes']
+        return ivfpq
+
+def build_ann_index(method=ANN_METHOD, save=True, **params):
+    """
+    Build an approximate index over the stored embedding matrix and persist it.
+    Returns the index and its build time in seconds.
+    """
+    matrix, embedding_ids = load_embedding_matrix()
+    start = time.perf_counter()
+    if method == "hnsw":
+        ann = HNSWIndex(matrix.shape[1], **params)
+    elif method == "ivfpq":
+        ann = IVFPQIndex(**params)
+    else:
+        raise ValueError(f"Unknown ANN method: {method}")
+    ann.build(np.asarray(embedding_ids), matrix)
+    build_time = time.perf_counter() - start
+
+    if save:
+        ann.save()
+    print(f"{method} index built over {len(embedding_ids)} recipes in {build_time:.1f}s.")
+    return ann, build_time
+
+def load_ann_index(method=ANN_METHOD):
+    """
+    Load the persisted ANN index, again whenever a new index version is published
+    (e.g. after update_metadata inserted new recipes).
+    """
+    global _ann_index, _ann_index_version
+    version = current_index_version()
+    if _ann_index is None or version != _ann_index_version:
+        if method == "hnsw":
+            matrix, _ = load_embedding_matrix()
+            _ann_index = HNSWIndex.load(matrix.shape[1])
+        elif method == "ivfpq":
+            _ann_index = IVFPQIndex.load()
+        else:
+            raise ValueError(f"Unknown ANN method: {method}")
+        _ann_index_version = version
+    return _ann_index
+
+def search_ann(query, top_k):
+    """
+    Approximate top-k as (score, RecipeId) pairs using the configured ANN index.
+    """
+    return load_ann_index().search(query, top_k)
+
+def add_to_ann_index(recipe_ids, vectors):
+    """
+    Incrementally insert newly embedded recipes into every persisted ANN index.
+    """
+    vectors = np.vstack([normalize_query(vector) for vector in vectors])
+    if os.path.exists(hnsw_index_path) and hnswlib is not None:
+        hnsw = HNSWIndex.load(vectors.shape[1])
+        hnsw.add(recipe_ids, vectors)
+        hnsw.save()
+        print(f"{len(recipe_ids)} recipes inserted into the HNSW index.")
+    if os.path.exists(ivfpq_index_path):
+        ivfpq = IVFPQIndex.load()
+        ivfpq.add(recipe_ids, vectors)
+        ivfpq.save()
+        print(f"{len(recipe_ids)} recipes inserted into the IVF-PQ index.")
+
+if __name__ == "__main__":
+    build_ann_index(sys.argv[1] if len(sys.argv) > 1 else ANN_METHOD)
+    publish_index_version()
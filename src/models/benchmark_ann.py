@@ -0,0 +1,61 @@
+import os
+import sys
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import time
+import numpy as np
+from src.models.vector_search import load_embedding_matrix, normalize_query, exact_search
+from src.models.ann_index import build_ann_index
+
+# Build parameters and search-time effort to compare
+configurations = [
+    ("hnsw", {"M": 16, "ef_construction": 200}, "ef_search", [16, 32, 64, 128, 256]),
+    ("hnsw", {"M": 32, "ef_construction": 400}, "ef_search", [32, 64, 128, 256]),
+    ("ivfpq", {"nlist": 1024, "m": 48}, "nprobe", [1, 4, 8, 16, 32, 64]),
+    ("ivfpq", {"nlist": 4096, "m": 48}, "nprobe", [4, 16, 32, 64, 128]),
+]
+
+def sample_queries(num_queries=1000, noise=0.05, seed=0):
+    """
+    Queries close to, but not equal to, stored recipes: sampled embeddings plus noise.
+    """
+    matrix, _ = load_embedding_matrix()
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(matrix.shape[0], min(num_queries, matrix.shape[0]), replace=False)
+    queries = np.asarray(matrix[rows]) + rng.normal(0, noise, (len(rows), matrix.shape[1])).astype(np.float32)
+    return [normalize_query(query) for query in queries]
+
+def exact_ground_truth(queries, top_k):
+    _, embedding_ids = load_embedding_matrix()
+    return [{int(embedding_ids[row]) for _, row in exact_search(query, top_k)} for query in queries]
+
+def run_benchmark(top_k=10, num_queries=1000):
+    """
+    Report recall@k against exact search, QPS and build time for every configuration.
+    """
+    queries = sample_queries(num_queries)
+    ground_truth = exact_ground_truth(queries, top_k)
+
+    print(f"{'method':<8}{'build params':<36}{'effort':<16}{'build s':>9}{'recall@' + str(top_k):>11}{'QPS':>10}")
+    for method, build_params, effort_name, efforts in configurations:
+        try:
+            ann, build_time = build_ann_index(method, save=False, **build_params)
+        except ImportError as e:
+            print(f"Skipping {method}: {e}")
+            continue
+
+        for effort in efforts:
+            start = time.perf_counter()
+            results = [ann.search(query, top_k, **{effort_name: effort}) for query in queries]
+            elapsed = time.perf_counter() - start
+
+            recall = np.mean([
+                len(truth & {recipe_id for _, recipe_id in result}) / len(truth)
+                for truth, result in zip(ground_truth, results)
+            ])
+            print(f"{method:<8}{str(build_params):<36}{effort_name + '=' + str(effort):<16}"
+                  f"{build_time:>9.1f}{recall:>11.4f}{len(queries) / elapsed:>10.0f}")
+
+if __name__ == "__main__":
+    run_benchmark(top_k=int(sys.argv[1]) if len(sys.argv) > 1 else 10)
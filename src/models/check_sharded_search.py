@@ -0,0 +1,41 @@
+import os
+import sys
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import numpy as np
+from src.models.vector_search import SCORE_BLOCK, ShardedSearcher, normalize_query, score_rows, top_k_rows
+
+def check_sharded_search(num_shards=4, dim=32, num_queries=50, top_k=10, seed=0):
+    """
+    Check that the sharded searcher returns exactly the single-process scan results
+    on a random matrix spanning several SCORE_BLOCK boundaries, with duplicated
+    rows so ties have to be broken by row.
+    """
+    rng = np.random.default_rng(seed)
+    num_rows = 3 * SCORE_BLOCK + 123
+    matrix = rng.normal(size=(num_rows, dim)).astype(np.float32)
+    duplicates = rng.choice(num_rows, 64, replace=False)
+    matrix[duplicates[32:]] = matrix[duplicates[:32]]
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    # Queries equal to duplicated rows tie at the top, across shards
+    queries = [normalize_query(query) for query in rng.normal(size=(num_queries, dim))]
+    queries += [matrix[row] for row in duplicates[:8]]
+
+    searcher = ShardedSearcher(matrix, num_shards=num_shards)
+    try:
+        mismatches = 0
+        for query in queries:
+            expected = top_k_rows(score_rows(matrix, query, 0, num_rows), top_k)
+            if searcher.search(query, top_k) != expected:
+                mismatches += 1
+    finally:
+        searcher.close()
+
+    print(f"{len(queries) - mismatches}/{len(queries)} queries identical "
+          f"({len(searcher.shards)} shards, {num_rows} rows).")
+    return mismatches == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_sharded_search() else 1)
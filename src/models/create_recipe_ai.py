@@ -4,21 +4,21 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.append(project_root)
 
 import re
-import openai
 import numpy as np
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone
-from src.utils.config import PINECONE_API_KEY
+from src.utils.upstream import chat_completion, UpstreamError
+from src.utils.admission import admit
+from src.models.pantry_search import find_recipes_by_pantry, user_ingredient_match
+from src.utils.recipe_store import hydrate_matches
+from src.models.review_aggregates import blend_review_score
+from src.models.nutrition_index import resolve_nutrition_constraints, filter_matches_by_nutrition
+from src.models.vector_search import search_vectors
 
 # Load environment variables
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-pinecone_api_key = os.getenv("PINECONE_API_KEY")
 
-# Initialize Pinecone and Sentence Transformer
-pc = Pinecone(api_key=pinecone_api_key)
-index = pc.Index("recipe-embeddings")
+# Initialize Sentence Transformer
 model = SentenceTransformer('all-MiniLM-L6-v2')
 
 def generate_ingredient_embedding(ingredients_list):
@@ -30,34 +30,30 @@ def generate_ingredient_embedding(ingredients_list):
     
     # Join all the ingredients into a single string to generate a combined embedding
     ingredients_text = ", ".join(ingredients_list)  
-    embedding = model.encode(ingredients_text).tolist()
+    with admit("embedding"):
+        embedding = model.encode(ingredients_text).tolist()
     return embedding
 
 def search_similar_recipes(ingredient_embedding, top_n=20):
     """
-    Query Pinecone to find similar recipes based on ingredient embeddings.
+    Query the vector index (Pinecone or local, see VECTOR_BACKEND) to find similar
+    recipes based on ingredient embeddings.
     """
-    query_response = index.query(
-        vector=ingredient_embedding,
-        top_k=top_n,
-        include_metadata=True,
-        namespace="recipes"
-    )
+    matches = search_vectors(ingredient_embedding, top_n, include_metadata=False)
 
     # Imprimir las recetas similares encontradas para depurar
-    print(f"Similar recipes found: {query_response['matches']}")
+    print(f"Similar recipes found: {matches}")
     
-    return query_response['matches']
+    return matches
 
 def filter_by_ingredient_match(similar_recipes, user_ingredients, threshold=0.5):
     """
     Filter the recipes based on the percentage of matching ingredients.
+    Recipe ingredients come from the compiled ingredient matrix, not the match metadata.
     """
     filtered_recipes = []
     for match in similar_recipes:
-        recipe_ingredients = match['metadata']['ingredients']
-        matched_ingredients = set(user_ingredients).intersection(set(recipe_ingredients.split(", ")))
-        if len(matched_ingredients) / len(user_ingredients) >= threshold:
+        if user_ingredient_match(match['id'], user_ingredients) >= threshold:
             filtered_recipes.append(match)
     return filtered_recipes
 
@@ -65,6 +61,7 @@ def generate_recipe_with_gpt(user_ingredients, closest_recipe):
     """
     Use GPT to generate a recipe based on the user's ingredients, while using
     the closest matching recipe from Pinecone for inspiration.
+    If GPT is unavailable the closest recipe is returned as stored.
     """
     recipe_name = closest_recipe['metadata'].get('name', 'Recipe')
     ingredients = ", ".join(user_ingredients)
@@ -76,15 +73,24 @@ def generate_recipe_with_gpt(user_ingredients, closest_recipe):
     )
 
     # Call GPT to generate the recipe
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant of a famous chef that generates recipes."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=1000,
-        temperature=0.7
-    )
+    try:
+        response = chat_completion(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant of a famous chef that generates recipes."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1000,
+            temperature=0.7
+        )
+    except UpstreamError as e:
+        print(f"Error generating recipe with GPT, falling back to the stored recipe: {e}")
+        return {
+            "title": recipe_name,
+            "ingredients": closest_recipe['metadata'].get('ingredients', 'Ingredients not provided'),
+            "instructions": closest_recipe['metadata'].get('instructions', 'Instructions not provided'),
+            "fallback": True
+        }
 
     recipe_text = response['choices'][0]['message']['content']
 
@@ -105,7 +111,64 @@ def generate_recipe_with_gpt(user_ingredients, closest_recipe):
     }
 
 
-def create_recipe_from_ingredients(user_ingredients):
+retrieval_modes = ("vector", "pantry")
+
+def find_closest_recipe(user_ingredients, retrieval_mode="vector", min_coverage=0.5, max_missing=None,
+                        rating_weight=0.0, nutrition=None):
+    """
+    Retrieval part of the recipe creation (steps 1-3): returns the closest matching
+    recipe, or a dict with an 'error'.
+    With retrieval_mode="pantry" steps 1-3 are replaced by an exact pantry-coverage
+    query over the whole corpus. A non-zero rating_weight re-ranks the candidates
+    with the precomputed review score, and nutrition constraints like
+    {"Calories": {"max": 500}} restrict the candidates through the nutrition index.
+    """
+    nutrition_bitmap = resolve_nutrition_constraints(nutrition)
+
+    if retrieval_mode == "pantry":
+        filtered_recipes = find_recipes_by_pantry(user_ingredients, min_coverage=min_coverage, max_missing=max_missing,
+                                                  candidate_mask=nutrition_bitmap)
+        if not filtered_recipes:
+            return {"error": "No recipes can be cooked with the given ingredients."}
+    else:
+        # Step 1: Generate embeddings for the ingredients
+        ingredient_embedding = generate_ingredient_embedding(user_ingredients)
+
+        # Step 2: Search for similar recipes
+        # Over-fetch when the candidates will be intersected with the nutrition bitmap
+        top_n = 20 if nutrition_bitmap is None else 100
+        similar_recipes = filter_matches_by_nutrition(search_similar_recipes(ingredient_embedding, top_n), nutrition_bitmap)
+        if not similar_recipes:
+            return {"error": "No similar recipes found."}
+
+        # Step 3: Filter recipes based on ingredient match
+        filtered_recipes = filter_by_ingredient_match(similar_recipes, user_ingredients)
+        if not filtered_recipes:
+            return {"error": "No recipes match the given ingredients after filtering."}
+
+    # Re-rank the candidates with their review score
+    if rating_weight:
+        filtered_recipes = sorted(
+            filtered_recipes,
+            key=lambda match: blend_review_score(match['score'], match['id'], rating_weight),
+            reverse=True
+        )
+
+    # Only the chosen recipe is hydrated with its full text
+    return hydrate_matches(filtered_recipes[:1])[0]
+
+def stored_recipe_response(closest_recipe):
+    """
+    Response body for the closest recipe as stored, before any GPT generation.
+    """
+    return {
+        "id": closest_recipe['id'],
+        "title": closest_recipe['metadata'].get('name', 'Recipe'),
+        "ingredients": closest_recipe['metadata'].get('ingredients', 'Ingredients not provided'),
+        "instructions": closest_recipe['metadata'].get('instructions', 'Instructions not provided')
+    }
+
+def create_recipe_from_ingredients(user_ingredients, **retrieval_options):
     """
     Main function that handles the full process of generating a recipe.
     - Takes a list of ingredients.
@@ -113,30 +176,38 @@ def create_recipe_from_ingredients(user_ingredients):
     - Searches for similar recipes.
     - Filters recipes by ingredient match.
     - Uses GPT to generate a new recipe based on the closest match.
+    retrieval_options are passed to find_closest_recipe.
     """
-    # Step 1: Generate embeddings for the ingredients
-    ingredient_embedding = generate_ingredient_embedding(user_ingredients)
-
-    # Step 2: Search for similar recipes
-    similar_recipes = search_similar_recipes(ingredient_embedding)
-    if not similar_recipes:
-        return {"error": "No similar recipes found."}
-
-    # Step 3: Filter recipes based on ingredient match
-    filtered_recipes = filter_by_ingredient_match(similar_recipes, user_ingredients)
-    if not filtered_recipes:
-        return {"error": "No recipes match the given ingredients after filtering."}
+    closest_recipe = find_closest_recipe(user_ingredients, **retrieval_options)
+    if "error" in closest_recipe:
+        return closest_recipe
+    return generated_recipe_response(user_ingredients, closest_recipe)
 
+def generated_recipe_response(user_ingredients, closest_recipe):
+    """
+    Generation part of the recipe creation (step 4): response body for the recipe
+    GPT writes from the closest recipe.
+    """
     # Step 4: Generate a new recipe based on the user's ingredients, using the closest recipe as inspiration
-    closest_recipe = filtered_recipes[0]
     generated_recipe = generate_recipe_with_gpt(user_ingredients, closest_recipe)
 
     # Use the generated title, ingredients, and instructions
-    return {
+    recipe_response = {
         "title": generated_recipe['title'],  # Title from GPT
         "ingredients": generated_recipe['ingredients'],  # Ingredients from GPT
         "instructions": generated_recipe['instructions']  # Instructions from GPT
     }
+    if generated_recipe.get('fallback'):
+        recipe_response['fallback'] = True  # Stored recipe, GPT was unavailable
+    return recipe_response
+
+def generated_recipe_job(user_ingredients, closest_recipe):
+    """
+    Deferred-job form of generated_recipe_response: the generated recipe as 'result'
+    and whether it is the stored fallback.
+    """
+    recipe_response = generated_recipe_response(user_ingredients, closest_recipe)
+    return {"result": recipe_response, "fallback": recipe_response.pop('fallback', False)}
 
 
 # # Example usage
@@ -5,23 +5,22 @@ sys.path.append(project_root)
 
 import pandas as pd
 import numpy as np
-import openai
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from src.utils.config import PINECONE_API_KEY
+from src.utils.upstream import chat_completion, UpstreamError
+from src.utils.admission import admit
+from src.models.vector_search import search_vectors, build_matches
+from src.models.neighbour_table import get_neighbours
+from src.utils.recipe_store import hydrate_matches
 
 load_dotenv()
-pinecone_api_key = os.getenv("PINECONE_API_KEY")
-openai_api_key = os.getenv("OPENAI_API_KEY")
-
-pc = Pinecone(api_key=pinecone_api_key)
-index = pc.Index("recipe-embeddings")
-openai.api_key = openai_api_key
 
 recipes_cleaned_path = "data/processed/recipes_cleaned.parquet"
 recipes_cleaned = pd.read_parquet(recipes_cleaned_path)
 
+# Loaded once, so live searches only hold an embedding slot while encoding
+model = SentenceTransformer('all-MiniLM-L6-v2')
+
 def find_recipe_by_name(recipe_name, recipes_cleaned):
     """
     Search for the recipe by name or similar ingredients in the cleaned recipes dataframe.
@@ -52,48 +51,55 @@ def generate_recipe_embedding(recipe):
     """
     Generate embeddings for the recipe based on ingredients using SentenceTransformer.
     """
-    model = SentenceTransformer('all-MiniLM-L6-v2')  
     ingredients_text = ' '.join(recipe['RecipeIngredientParts'])  
-    recipe_embedding = model.encode(ingredients_text)  
+    with admit("embedding"):
+        recipe_embedding = model.encode(ingredients_text)  
     return recipe_embedding 
 
 def search_similar_recipes_in_pinecone(recipe_embedding, top_n=5):
     """
-    Search for similar recipes in Pinecone using the recipe embedding.
+    Search for similar recipes in the vector index (Pinecone or local, see
+    VECTOR_BACKEND) using the recipe embedding.
     """
-    # Convert the NumPy array to a list
-    recipe_embedding_list = recipe_embedding.tolist()
-    
-    query_response = index.query(
-        vector=recipe_embedding_list,  
-        top_k=top_n,
-        include_metadata=True,
-        namespace="recipes"
-    )
-    
-    return query_response
+    return {"matches": hydrate_matches(search_vectors(recipe_embedding, top_n, include_metadata=False))}
 
-def explain_similarity_in_english(original_recipe_name, similar_recipe_name):
+def explain_similarity(original_recipe_name, similar_recipe_name):
     """
     Generate a GPT response in English explaining why the two recipes are similar.
+    Returns the explanation and whether it is the canned fallback used when GPT
+    is unavailable.
     """
     messages = [
         {"role": "system", "content": "You are a helpful assistant that explains why two recipes are similar."},
         {"role": "user", "content": f"Explain why the recipe '{original_recipe_name}' is similar to '{similar_recipe_name}'."}
     ]
     
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=messages,
-        max_tokens=1500
-    )
+    try:
+        response = chat_completion(
+            model="gpt-4",
+            messages=messages,
+            max_tokens=1500
+        )
+    except UpstreamError as e:
+        print(f"Error explaining similarity with GPT: {e}")
+        return f"'{similar_recipe_name}' uses ingredients similar to '{original_recipe_name}'.", True
     
     explanation = response['choices'][0]['message']['content'].strip()
-    return explanation
+    return explanation, False
 
-def find_similar_recipe_flow(user_recipe_name, recipes_cleaned):
+def explain_similarity_in_english(original_recipe_name, similar_recipe_name):
     """
-    Main flow to find, embed, and search similar recipes in Pinecone.
+    The similarity explanation as polled by deferred jobs: the text as 'result' and
+    whether it is the canned fallback.
+    """
+    explanation, fallback = explain_similarity(original_recipe_name, similar_recipe_name)
+    return {"result": explanation, "fallback": fallback}
+
+def find_similar_recipe_flow(user_recipe_name, recipes_cleaned=recipes_cleaned, top_n=5, explain=True):
+    """
+    Main flow to find similar recipes: served from the precomputed neighbour table
+    when the recipe is in it, otherwise embedded and searched live.
+    With explain=False the GPT explanation is skipped so it can be generated later.
     """
     # Find the recipe in the database
     recipe = find_recipe_by_name(user_recipe_name, recipes_cleaned)
@@ -101,21 +107,34 @@ def find_similar_recipe_flow(user_recipe_name, recipes_cleaned):
     if recipe is not None:
         print(f"Recipe found: {recipe['Name']}")
         
-        # Generate the recipe embedding
-        recipe_embedding = generate_recipe_embedding(recipe)
-        
-        # Search for similar recipes in Pinecone
-        similar_recipes = search_similar_recipes_in_pinecone(recipe_embedding)
+        neighbours = get_neighbours(recipe['RecipeId'], top_n)
+        if neighbours is not None:
+            similar_recipes = {"matches": build_matches(neighbours)}
+        else:
+            # Generate the recipe embedding
+            recipe_embedding = generate_recipe_embedding(recipe)
+            
+            # Search for similar recipes in the vector index, without the recipe
+            # itself, like the neighbour table
+            similar_recipes = search_similar_recipes_in_pinecone(recipe_embedding, top_n + 1)
+            similar_recipes['matches'] = [
+                match for match in similar_recipes['matches']
+                if int(float(match['id'])) != int(recipe['RecipeId'])
+            ][:top_n]
         
         if similar_recipes['matches']:
             closest_match = similar_recipes['matches'][0]  # Take the closest recipe
-            similar_recipe_name = closest_match['metadata']['name']
+            similar_recipe_name = closest_match['metadata'].get('name', 'Recipe')
             
             print(f"Similar recipe found: {similar_recipe_name}")
             
-            # Use GPT to explain the similarity in English
-            explanation = explain_similarity_in_english(user_recipe_name, similar_recipe_name)
-            print(f"GPT Explanation: {explanation}")
+            if explain:
+                # Use GPT to explain the similarity in English
+                explanation, fallback = explain_similarity(user_recipe_name, similar_recipe_name)
+                print(f"GPT Explanation: {explanation}")
+                similar_recipes['explanation'] = explanation
+                if fallback:
+                    similar_recipes['fallback'] = True  # Canned text, GPT was unavailable
         
         return similar_recipes
     else:
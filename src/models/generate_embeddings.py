@@ -11,6 +11,7 @@ import pandas as pd
 from sentence_transformers import SentenceTransformer
 from pinecone import Pinecone
 from src.utils.config import PINECONE_API_KEY
+from src.utils.index_version import publish_index_version
 
 # Initialize Pinecone
 pc = Pinecone(api_key=PINECONE_API_KEY)
@@ -50,7 +51,9 @@ def save_new_embeddings_data(recipes):
 
 async def update_metadata_in_pinecone_async(index, recipes, batch_size=100, namespace="recipes"):
     """
-    Update Pinecone with new vectors based on ingredients asynchronously and include metadata like name, instructions, ingredients, and total_time.
+    Update Pinecone with new vectors based on ingredients asynchronously.
+    Only the small fields used for filtering are stored as metadata; the full recipe
+    text lives in the local recipe text store.
     """
     total_recipes = len(recipes)
 
@@ -62,21 +65,8 @@ async def update_metadata_in_pinecone_async(index, recipes, batch_size=100, name
             # Generate new vector based on cleaned ingredients
             ingredient_vector = row['ingredient_embeddings']
 
-            # Extract and format ingredients
-            ingredients = row["RecipeIngredientParts"]
-            if isinstance(ingredients, np.ndarray):
-                ingredients = ingredients.tolist()  
-            if isinstance(ingredients, list):
-                ingredients = ", ".join(ingredients) 
-
-            # Extract instructions
-            instructions = row.get("RecipeInstructions", "")
-
-            # Prepare metadata update (keeping existing name, ingredients, total_time, and adding instructions)
+            # Slim metadata: name, ingredients and instructions are hydrated locally
             metadata = {
-                "name": row["Name"],
-                "ingredients": ingredients,  
-                "instructions": instructions,  
                 "total_time": row.get("TotalTimeMinutes", 0)  
             }
 
@@ -111,3 +101,6 @@ if __name__ == "__main__":
 
     # Update Pinecone with new vectors and metadata
     asyncio.run(update_metadata_in_pinecone_async(index, recipes, batch_size=100))
+
+    # Publish the new index version so serving processes drop cached responses
+    publish_index_version()
@@ -3,12 +3,10 @@ import sys
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(project_root)
 
-import openai
 from dotenv import load_dotenv
-import os
+from src.utils.upstream import chat_completion
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 def generate_recipe_text(recipe_name, ingredients):
     """
@@ -19,7 +17,7 @@ def generate_recipe_text(recipe_name, ingredients):
         {"role": "user", "content": f"Create a detailed recipe for {recipe_name} using the following ingredients: {ingredients}."}
     ]
     
-    response = openai.ChatCompletion.create(
+    response = chat_completion(
         model="gpt-4o",  
         messages=messages,
         max_tokens=500
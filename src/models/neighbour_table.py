@@ -0,0 +1,144 @@
+import os
+import sys
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import multiprocessing
+import numpy as np
+from tqdm import tqdm
+from src.models.vector_search import embedding_matrix_path, embedding_ids_path, load_embedding_matrix
+from src.utils.index_version import current_index_version, publish_index_version
+from src.utils.atomic_files import temp_path, save_npy_atomic
+
+# Top-k neighbours of every recipe, aligned with the rows of the embedding matrix
+neighbour_ids_path = "data/processed/neighbour_ids.npy"
+neighbour_scores_path = "data/processed/neighbour_scores.npy"
+# RecipeIds of the embedding matrix rows the table was built from
+neighbour_source_ids_path = "data/processed/neighbour_source_ids.npy"
+
+_neighbour_table = None
+_neighbour_table_version = None
+
+def _neighbour_block(args):
+    """
+    Top-k neighbours of rows [start, stop), excluding the rows themselves.
+    Peak memory is one (row_block x col_block) score matrix plus the running top-k.
+    """
+    start, stop, top_k, col_block, ids_path, scores_path = args
+    matrix = np.load(embedding_matrix_path, mmap_mode='r')
+    num_rows = matrix.shape[0]
+    queries = np.asarray(matrix[start:stop])
+    local = np.arange(stop - start)
+
+    best_scores = np.full((stop - start, top_k), -np.inf, dtype=np.float32)
+    best_rows = np.full((stop - start, top_k), -1, dtype=np.int64)
+
+    for col_start in range(0, num_rows, col_block):
+        col_stop = min(col_start + col_block, num_rows)
+        scores = queries @ np.asarray(matrix[col_start:col_stop]).T
+
+        # A recipe is not its own neighbour
+        own = (local + start >= col_start) & (local + start < col_stop)
+        scores[local[own], local[own] + start - col_start] = -np.inf
+
+        k = min(top_k, col_stop - col_start)
+        block_best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidate_scores = np.concatenate([best_scores, np.take_along_axis(scores, block_best, axis=1)], axis=1)
+        candidate_rows = np.concatenate([best_rows, block_best + col_start], axis=1)
+
+        keep = np.argpartition(-candidate_scores, top_k - 1, axis=1)[:, :top_k]
+        best_scores = np.take_along_axis(candidate_scores, keep, axis=1)
+        best_rows = np.take_along_axis(candidate_rows, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+    # Write straight into the output table so results never accumulate in memory
+    neighbour_ids = np.load(ids_path, mmap_mode='r+')
+    neighbour_scores = np.load(scores_path, mmap_mode='r+')
+    embedding_ids = np.load(embedding_ids_path, mmap_mode='r')
+    neighbour_ids[start:stop] = np.where(best_rows >= 0, embedding_ids[np.maximum(best_rows, 0)], -1)
+    neighbour_scores[start:stop] = best_scores
+    neighbour_ids.flush()
+    neighbour_scores.flush()
+    return stop - start
+
+def compute_neighbour_table(top_k=10, row_block=1024, col_block=16384, num_workers=None):
+    """
+    Compute the top-k neighbours of every recipe with blocked matrix-matrix products
+    over the normalized embedding matrix, in parallel across processes.
+    The table is built in temporary files and moved into place once complete, so
+    serving processes keep reading the previous table until the next version.
+    """
+    matrix, embedding_ids = load_embedding_matrix()
+    num_rows = matrix.shape[0]
+    top_k = min(top_k, num_rows - 1)
+
+    ids_path, scores_path = temp_path(neighbour_ids_path), temp_path(neighbour_scores_path)
+    np.lib.format.open_memmap(ids_path, mode='w+', dtype=np.int32, shape=(num_rows, top_k)).flush()
+    np.lib.format.open_memmap(scores_path, mode='w+', dtype=np.float32, shape=(num_rows, top_k)).flush()
+
+    tasks = [
+        (start, min(start + row_block, num_rows), top_k, col_block, ids_path, scores_path)
+        for start in range(0, num_rows, row_block)
+    ]
+    with multiprocessing.Pool(processes=num_workers or os.cpu_count()) as pool:
+        for _ in tqdm(pool.imap_unordered(_neighbour_block, tasks), total=len(tasks)):
+            pass
+
+    # The source ids go last: they are what load_neighbour_table validates against
+    os.replace(ids_path, neighbour_ids_path)
+    os.replace(scores_path, neighbour_scores_path)
+    save_npy_atomic(neighbour_source_ids_path, np.asarray(embedding_ids))
+    print(f"Neighbour table saved: {num_rows} recipes x {top_k} neighbours.")
+
+def load_neighbour_table():
+    """
+    Memory-map the neighbour table, or return None if it hasn't been computed or
+    was built from another embedding matrix than the current one. Reloaded when a
+    new index version is published.
+    """
+    global _neighbour_table, _neighbour_table_version
+    version = current_index_version()
+    if version == _neighbour_table_version:
+        return _neighbour_table
+    _neighbour_table_version = version
+    _neighbour_table = None
+
+    if not (os.path.exists(neighbour_ids_path) and os.path.exists(neighbour_source_ids_path)):
+        return None
+    source_ids = np.load(neighbour_source_ids_path, mmap_mode='r')
+    _, embedding_ids = load_embedding_matrix()
+    if not np.array_equal(source_ids, embedding_ids):
+        print("Neighbour table was built from another embedding matrix, falling back to live search.")
+        return None
+    _neighbour_table = (
+        source_ids,
+        np.load(neighbour_ids_path, mmap_mode='r'),
+        np.load(neighbour_scores_path, mmap_mode='r')
+    )
+    return _neighbour_table
+
+def get_neighbours(recipe_id, top_n=5):
+    """
+    Return the precomputed (score, RecipeId) neighbours of a recipe, or None if the
+    recipe is not in the table.
+    """
+    neighbour_table = load_neighbour_table()
+    if neighbour_table is None:
+        return None
+    source_ids, neighbour_ids, neighbour_scores = neighbour_table
+
+    row = int(np.searchsorted(source_ids, int(recipe_id)))
+    if row >= len(source_ids) or source_ids[row] != int(recipe_id) or row >= len(neighbour_ids):
+        return None
+    return [
+        (float(score), int(neighbour_id))
+        for neighbour_id, score in zip(neighbour_ids[row, :top_n], neighbour_scores[row, :top_n])
+        if neighbour_id >= 0
+    ]
+
+if __name__ == "__main__":
+    compute_neighbour_table(top_k=int(sys.argv[1]) if len(sys.argv) > 1 else 10)
+    publish_index_version()
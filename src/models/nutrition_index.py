@@ -0,0 +1,143 @@
+import os
+import sys
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import numpy as np
+import pandas as pd
+from src.utils.index_version import publish_index_version, current_index_version
+from src.utils.atomic_files import temp_path
+from src.utils.recipe_store import load_recipe_ids, recipe_row, recipe_rows_for, record_alignment, check_alignment
+
+nutrition_data_path = "data/processed/nutrition_data.parquet"
+nutrition_index_path = "data/processed/nutrition_index.npz"
+
+nutrition_columns = ['Calories', 'FatContent', 'SaturatedFatContent', 'CholesterolContent',
+                     'SodiumContent', 'CarbohydrateContent', 'FiberContent',
+                     'SugarContent', 'ProteinContent']
+
+_nutrition_index = None
+_nutrition_index_version = None
+
+def build_nutrition_index(nutrition_data):
+    """
+    Build, for every nutrition column, the values in recipe store row order plus
+    the sorted values with their row-ID permutation.
+    """
+    num_recipes = len(load_recipe_ids())
+    rows = recipe_rows_for(nutrition_data['RecipeId'].to_numpy())
+    known = rows >= 0
+
+    arrays = {}
+    for column in nutrition_columns:
+        values = np.full(num_recipes, np.nan, dtype=np.float32)
+        values[rows[known]] = nutrition_data[column].to_numpy(dtype=np.float32)[known]
+
+        # Recipes without a value never satisfy a range predicate
+        present = np.flatnonzero(~np.isnan(values))
+        order = present[np.argsort(values[present], kind='stable')]
+
+        arrays[f"{column}_values"] = values
+        arrays[f"{column}_sorted"] = values[order]
+        arrays[f"{column}_rows"] = order.astype(np.int32)
+    return arrays
+
+def save_nutrition_index(arrays):
+    """
+    Save the nutrition index next to the recipe store, replacing the previous file atomically.
+    """
+    np.savez(temp_path(nutrition_index_path), **arrays)
+    os.replace(temp_path(nutrition_index_path), nutrition_index_path)
+    record_alignment(nutrition_index_path)
+    print("Nutrition index saved in 'data/processed/'")
+
+def load_nutrition_index():
+    """
+    Load every array of the nutrition index into memory, again when a new index
+    version is published.
+    """
+    global _nutrition_index, _nutrition_index_version
+    version = current_index_version()
+    if _nutrition_index is None or version != _nutrition_index_version:
+        check_alignment(nutrition_index_path)
+        with np.load(nutrition_index_path) as data:
+            _nutrition_index = {name: data[name] for name in data.files}
+        _nutrition_index_version = version
+    return _nutrition_index
+
+def parse_nutrition_constraints(constraints):
+    """
+    Turn a request payload like {"Calories": {"max": 500}, "ProteinContent": {"min": 30}}
+    into {column: (low, high)} bounds. Malformed payloads raise ValueError.
+    """
+    if constraints is not None and not isinstance(constraints, dict):
+        raise ValueError("Nutrition constraints must be an object of {column: {min, max}}")
+    bounds = {}
+    for column, limits in (constraints or {}).items():
+        if column not in nutrition_columns:
+            raise ValueError(f"Unknown nutrition column: {column}")
+        if not isinstance(limits, dict):
+            raise ValueError(f"Nutrition limits for {column} must be an object with 'min' and/or 'max'")
+        low = limits.get('min')
+        high = limits.get('max')
+        try:
+            bounds[column] = (
+                -np.inf if low is None else float(low),
+                np.inf if high is None else float(high)
+            )
+        except (TypeError, ValueError):
+            raise ValueError(f"Nutrition limits for {column} must be numbers")
+    return bounds
+
+def resolve_nutrition_constraints(constraints):
+    """
+    Resolve multi-column range predicates into a candidate bitmap over the recipe store.
+    The most selective predicate is answered with two binary searches on its sorted
+    column; the remaining ones are checked only on those candidates.
+    Returns None when there are no constraints.
+    """
+    bounds = parse_nutrition_constraints(constraints)
+    if not bounds:
+        return None
+
+    nutrition_index = load_nutrition_index()
+
+    ranges = {}
+    for column, (low, high) in bounds.items():
+        sorted_values = nutrition_index[f"{column}_sorted"]
+        start = np.searchsorted(sorted_values, low, side='left')
+        stop = np.searchsorted(sorted_values, high, side='right')
+        ranges[column] = (start, stop)
+
+    driver = min(ranges, key=lambda column: ranges[column][1] - ranges[column][0])
+    start, stop = ranges[driver]
+    candidates = nutrition_index[f"{driver}_rows"][start:stop]
+
+    for column, (low, high) in bounds.items():
+        if column == driver:
+            continue
+        values = nutrition_index[f"{column}_values"][candidates]
+        candidates = candidates[(values >= low) & (values <= high)]
+
+    bitmap = np.zeros(len(nutrition_index[f"{driver}_values"]), dtype=bool)
+    bitmap[candidates] = True
+    return bitmap
+
+def filter_matches_by_nutrition(matches, bitmap):
+    """
+    Keep only the vector search matches whose recipe satisfies the nutrition bitmap.
+    """
+    if bitmap is None:
+        return matches
+    filtered = []
+    for match in matches:
+        row = recipe_row(match['id'])
+        if 0 <= row < len(bitmap) and bitmap[row]:
+            filtered.append(match)
+    return filtered
+
+if __name__ == "__main__":
+    nutrition_data = pd.read_parquet(nutrition_data_path)
+    arrays = build_nutrition_index(nutrition_data)
+    save_nutrition_index(arrays)
+    publish_index_version()
@@ -0,0 +1,189 @@
+import os
+import sys
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import json
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.utils.admission import admit
+from src.utils.index_version import publish_index_version, current_index_version
+from src.utils.recipe_store import (
+    recipes_cleaned_path, load_recipe_ids, recipe_row, get_recipe_metadata, record_alignment, check_alignment
+)
+from src.utils.atomic_files import temp_path
+
+# Compiled recipe-by-ingredient matrix, aligned with the recipe store rows
+ingredient_matrix_path = "data/processed/ingredient_matrix.npz"
+ingredient_vocab_path = "data/processed/ingredient_vocab.json"
+
+_pantry_index = None
+_pantry_index_version = None
+
+def normalize_ingredient(ingredient):
+    """
+    Normalize an ingredient string so that user input and recipe data compare equal.
+    """
+    return " ".join(str(ingredient).lower().split())
+
+def build_ingredient_matrix(recipes):
+    """
+    Compile 'ingredients_cleaned' into a binary recipe-by-ingredient CSR matrix.
+    Returns the matrix and the ingredient -> column vocabulary.
+    """
+    vocab = {}
+    indptr = [0]
+    indices = []
+
+    for ingredients in recipes['ingredients_cleaned']:
+        columns = set()
+        if isinstance(ingredients, (list, np.ndarray)):
+            for ingredient in ingredients:
+                name = normalize_ingredient(ingredient)
+                if name:
+                    columns.add(vocab.setdefault(name, len(vocab)))
+        indices.extend(sorted(columns))
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32),
+         np.asarray(indices, dtype=np.int32),
+         np.asarray(indptr, dtype=np.int64)),
+        shape=(len(recipes), len(vocab))
+    )
+    return matrix, vocab
+
+def save_ingredient_matrix(matrix, vocab):
+    """
+    Save the compiled ingredient matrix and its vocabulary, replacing the previous
+    files atomically.
+    """
+    sparse.save_npz(temp_path(ingredient_matrix_path), matrix)
+    with open(temp_path(ingredient_vocab_path), "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    os.replace(temp_path(ingredient_matrix_path), ingredient_matrix_path)
+    os.replace(temp_path(ingredient_vocab_path), ingredient_vocab_path)
+    record_alignment(ingredient_matrix_path)
+    print(f"Ingredient matrix saved: {matrix.shape[0]} recipes x {matrix.shape[1]} ingredients.")
+
+def load_pantry_index():
+    """
+    Load the ingredient matrix, its vocabulary and the number of ingredients per recipe,
+    again when a new index version is published, together with the recipe store.
+    """
+    global _pantry_index, _pantry_index_version
+    version = current_index_version()
+    if _pantry_index is None or version != _pantry_index_version:
+        check_alignment(ingredient_matrix_path)
+        matrix = sparse.load_npz(ingredient_matrix_path).tocsr()
+        with open(ingredient_vocab_path, encoding="utf-8") as f:
+            vocab = json.load(f)
+        recipe_sizes = np.diff(matrix.indptr).astype(np.float32)
+        _pantry_index = (matrix, vocab, recipe_sizes)
+        _pantry_index_version = version
+    return _pantry_index
+
+def pantry_vector(user_ingredients):
+    """
+    Build the binary pantry vector over the ingredient vocabulary.
+    """
+    matrix, vocab, _ = load_pantry_index()
+    pantry = np.zeros(matrix.shape[1], dtype=np.float32)
+    columns = [vocab[name] for name in map(normalize_ingredient, user_ingredients) if name in vocab]
+    pantry[columns] = 1.0
+    return pantry
+
+def pantry_coverage(user_ingredients):
+    """
+    Compute, for every recipe in the corpus, how many of its ingredients are in the
+    pantry and the fraction they represent, with a single sparse mat-vec.
+    """
+    matrix, _, recipe_sizes = load_pantry_index()
+    matched = matrix @ pantry_vector(user_ingredients)
+    coverage = np.divide(matched, recipe_sizes, out=np.zeros_like(matched), where=recipe_sizes > 0)
+    return matched, coverage
+
+def user_ingredient_match(recipe_id, user_ingredients):
+    """
+    Fraction of the user's ingredients that appear in a recipe, read from the
+    recipe's row of the ingredient matrix. Unknown recipes match nothing.
+    """
+    matrix, vocab, _ = load_pantry_index()
+    row = recipe_row(recipe_id)
+    if row < 0 or row >= matrix.shape[0] or not user_ingredients:
+        return 0.0
+    recipe_columns = set(matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]].tolist())
+    user_columns = {vocab.get(name) for name in map(normalize_ingredient, user_ingredients)}
+    return len(user_columns & recipe_columns) / len(user_ingredients)
+
+def parse_pantry_options(min_coverage, max_missing, top_n=20):
+    """
+    Validate a request's pantry options: min_coverage a number in [0, 1], max_missing
+    None or a non-negative integer, top_n a positive integer. Raises ValueError.
+    """
+    def is_number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    if not is_number(min_coverage) or not 0 <= min_coverage <= 1:
+        raise ValueError("min_coverage must be a number between 0 and 1")
+    if max_missing is not None and (not is_number(max_missing) or not float(max_missing).is_integer() or max_missing < 0):
+        raise ValueError("max_missing must be a non-negative integer")
+    if not is_number(top_n) or not float(top_n).is_integer() or top_n < 1:
+        raise ValueError("top_n must be a positive integer")
+    return float(min_coverage), None if max_missing is None else int(max_missing), int(top_n)
+
+def find_recipes_by_pantry(user_ingredients, min_coverage=0.0, max_missing=None, top_n=20, candidate_mask=None):
+    """
+    Return the recipes of the whole corpus that can be cooked with the user's pantry:
+    at least 'min_coverage' of their ingredients available and at most 'max_missing'
+    ingredients missing. Results are ranked by coverage, then by fewest missing.
+    An optional boolean candidate_mask over the recipe store (e.g. a nutrition
+    bitmap) restricts the corpus before ranking.
+    """
+    _, _, recipe_sizes = load_pantry_index()
+    with admit("retrieval"):
+        matched, coverage = pantry_coverage(user_ingredients)
+    missing = recipe_sizes - matched
+
+    mask = (matched > 0) & (coverage >= min_coverage)
+    if max_missing is not None:
+        mask &= missing <= max_missing
+    if candidate_mask is not None:
+        mask &= candidate_mask
+
+    candidates = np.flatnonzero(mask)
+    if candidates.size == 0:
+        return []
+
+    # Partial selection first so ranking stays cheap on large candidate sets
+    if candidates.size > top_n:
+        keys = coverage[candidates] - missing[candidates] * 1e-6
+        candidates = candidates[np.argpartition(-keys, top_n - 1)[:top_n]]
+    order = np.lexsort((candidates, missing[candidates], -coverage[candidates]))
+    rows = candidates[order]
+
+    recipe_ids = load_recipe_ids()
+    metadata = get_recipe_metadata(rows)
+    return [
+        {
+            "id": str(recipe_ids[row]),
+            "score": float(coverage[row]),
+            "matched_ingredients": int(matched[row]),
+            "missing_ingredients": int(missing[row]),
+            "metadata": recipe_metadata
+        }
+        for row, recipe_metadata in zip(rows, metadata)
+    ]
+
+if __name__ == "__main__":
+    # The row order comes from the recipe store (python -m src.utils.recipe_store)
+    recipes = pd.read_parquet(recipes_cleaned_path, columns=['RecipeId', 'ingredients_cleaned'])
+    if not np.array_equal(recipes['RecipeId'].astype(np.int64).to_numpy(), load_recipe_ids()):
+        raise ValueError("Recipes are not in recipe store row order, rebuild the recipe store first.")
+
+    matrix, vocab = build_ingredient_matrix(recipes)
+    save_ingredient_matrix(matrix, vocab)
+
+    # Responses computed from the previous artifacts are dropped from the caches
+    publish_index_version()
@@ -5,13 +5,15 @@ sys.path.append(project_root)
 
 import pandas as pd
 import numpy as np
-import openai
 from sentence_transformers import SentenceTransformer
 from collections import defaultdict
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from src.utils.config import PINECONE_API_KEY
-from scipy.spatial.distance import cosine
+from src.utils.upstream import chat_completion, UpstreamError
+from src.utils.admission import admit, Overloaded
+from src.models.review_aggregates import blend_review_score
+from src.models.nutrition_index import resolve_nutrition_constraints, filter_matches_by_nutrition
+from src.models.vector_search import search_vectors, fetch_vector
+from src.utils.recipe_store import hydrate_matches
 
 # Load the cleaned recipes
 recipes_cleaned_path = "data/processed/recipes_cleaned.parquet"
@@ -20,10 +22,6 @@ recipes_cleaned = pd.read_parquet(recipes_cleaned_path)
 # Convert RecipeId to string to match Pinecone format
 recipes_cleaned['RecipeId'] = recipes_cleaned['RecipeId'].astype(str)
 
-# Initialize Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index("recipe-embeddings")
-
 # Load the sentence transformer model (same as used for recipe embeddings)
 model = SentenceTransformer('all-MiniLM-L6-v2')  # Example model
 
@@ -31,79 +29,81 @@ def vectorize_ingredients(ingredients):
     """
     Generates an embedding for a list of ingredients.
     """
-    return model.encode(", ".join(ingredients))  # Joining ingredients for a single embedding
+    with admit("embedding"):
+        return model.encode(", ".join(ingredients))  # Joining ingredients for a single embedding
 
 def search_recipes(user_embedding, top_n=15):
     """
-    Searches for recipes in Pinecone using the ingredient embeddings.
+    Searches for recipes using the ingredient embeddings (Pinecone or the local
+    index, depending on VECTOR_BACKEND).
     """
     try:
-        query_response = index.query(
-            vector=user_embedding.tolist(),
-            top_k=top_n,
-            include_metadata=True,
-            namespace="recipes"
-        )
-        return query_response['matches']
+        return search_vectors(user_embedding, top_n, include_metadata=False)
+    except (Overloaded, UpstreamError):
+        # Shed or upstream down: surfaced as 503, not as "no recipe found"
+        raise
     except Exception as e:
         print(f"Error searching for recipes: {e}")
         return []
 
 def fetch_recipe_vector(recipe_id):
     """
-    Retrieves the vector and metadata of a specific recipe in Pinecone.
+    Retrieves the stored vector of a specific recipe.
     """
     try:
-        recipe_data = index.fetch([recipe_id], namespace="recipes")
-        return recipe_data
+        return fetch_vector(recipe_id)
+    except (Overloaded, UpstreamError):
+        raise
     except Exception as e:
         print(f"Error retrieving vector for recipe {recipe_id}: {e}")
         return None
 
-def find_most_similar_recipe(user_ingredients):
+def find_most_similar_recipe(user_ingredients, rating_weight=0.0, nutrition=None, generate=True):
     """
     Finds the most similar recipe based on user-provided ingredients.
+    A non-zero rating_weight blends the precomputed review score into the ranking,
+    and nutrition constraints restrict the candidates through the nutrition index.
+    With generate=False only the retrieval result is returned and the GPT recipe
+    can be produced later with generate_validated_gpt_recipe.
     """
+    nutrition_bitmap = resolve_nutrition_constraints(nutrition)
+
     user_embedding = vectorize_ingredients(user_ingredients)
-    similar_recipes = search_recipes(user_embedding)
+    if nutrition_bitmap is None:
+        similar_recipes = search_recipes(user_embedding)
+    else:
+        # Over-fetch so enough candidates pass the filter, then rank the usual 15
+        similar_recipes = filter_matches_by_nutrition(search_recipes(user_embedding, top_n=100), nutrition_bitmap)[:15]
 
     if similar_recipes:
         max_similarity = -1
-        best_recipe = None
+        best_match = None
 
         for match in similar_recipes:
-            recipe_id = match['id']
-            recipe_metadata = match['metadata']
-
-            recipe_vector_data = fetch_recipe_vector(recipe_id)
-            if recipe_vector_data and recipe_id in recipe_vector_data['vectors']:
-                recipe_embedding = np.array(recipe_vector_data['vectors'][recipe_id]['values'])
-            else:
-                print(f"Warning: Recipe ID {recipe_id} has an empty embedding.")
-                continue
-            
-            similarity = 1 - cosine(user_embedding, recipe_embedding)
-
-            if similarity > max_similarity:
-                max_similarity = similarity
-                best_recipe = {
-                    "id": recipe_id,
-                    "title": recipe_metadata.get('name', 'Untitled Recipe'),
-                    "ingredients": recipe_metadata.get('ingredients', 'Not available'),
-                    "instructions": recipe_metadata.get('instructions', 'Not available'),
-                    "similarity": similarity
-                }
+            # Every backend scores by cosine similarity, so no per-match vector fetch is needed
+            similarity = float(match['score'])
+            ranking_score = blend_review_score(similarity, match['id'], rating_weight)
 
-        # Generate a detailed recipe using GPT after finding the best match
-        if best_recipe:
-            best_recipe['gpt_recipe'] = generate_gpt_recipe(
-                best_recipe['title'],
-                best_recipe['ingredients'].split(', '),
-                best_recipe['instructions']
-            )
+            if ranking_score > max_similarity:
+                max_similarity = ranking_score
+                best_match = (match, similarity)
 
-        # Validate the generated recipe instructions
-        best_recipe['gpt_recipe'] = validate_gpt_instructions(best_recipe['gpt_recipe'])
+        best_recipe = None
+        if best_match:
+            # Only the best match is hydrated with its full text
+            match, similarity = best_match
+            recipe_metadata = hydrate_matches([match])[0]['metadata']
+            best_recipe = {
+                "id": match['id'],
+                "title": recipe_metadata.get('name', 'Untitled Recipe'),
+                "ingredients": recipe_metadata.get('ingredients', 'Not available'),
+                "instructions": recipe_metadata.get('instructions', 'Not available'),
+                "similarity": similarity
+            }
+
+        # Generate a detailed recipe using GPT after finding the best match
+        if best_recipe and generate:
+            best_recipe['gpt_recipe'] = generate_validated_gpt_recipe(best_recipe)
 
         return best_recipe
     else:
@@ -112,6 +112,7 @@ def find_most_similar_recipe(user_ingredients):
 def generate_gpt_recipe(title, ingredients, instructions):
     """
     Generates a detailed recipe using GPT.
+    Returns None when GPT fails or its circuit is open.
     """
     messages = [
         {"role": "system", "content": "You are a helpful assistant that generates detailed recipes."},
@@ -120,7 +121,7 @@ def generate_gpt_recipe(title, ingredients, instructions):
     ]
 
     try:
-        response = openai.ChatCompletion.create(
+        response = chat_completion(
             model="gpt-4",
             messages=messages,
             max_tokens=1500,
@@ -128,8 +129,38 @@ def generate_gpt_recipe(title, ingredients, instructions):
         )
         return response['choices'][0]['message']['content']
     except Exception as e:
-        print(f"Error generating recipe with GPT: {e}")
-        return "Error generating recipe."
+        print(f"Error generating recipe with GPT, falling back to the stored recipe: {e}")
+        return None
+
+def stored_recipe_text(ingredients, instructions):
+    """
+    The stored recipe, in the same layout as a GPT recipe.
+    """
+    return "Ingredients:\n" + "\n".join(f"- {ingredient}" for ingredient in ingredients) + "\n\nInstructions:\n" + instructions
+
+def generate_validated_gpt_recipe(best_recipe):
+    """
+    Generates the detailed GPT recipe for a retrieved recipe and validates it.
+    When GPT is unavailable the stored recipe is returned and best_recipe is
+    flagged with 'fallback', so the response isn't cached as a generated one.
+    """
+    ingredients = best_recipe['ingredients'].split(', ')
+    gpt_recipe = generate_gpt_recipe(best_recipe['title'], ingredients, best_recipe['instructions'])
+    if gpt_recipe is None:
+        best_recipe['fallback'] = True
+        return stored_recipe_text(ingredients, best_recipe['instructions'])
+
+    # Validate the generated recipe instructions
+    return validate_gpt_instructions(gpt_recipe)
+
+def gpt_recipe_job(best_recipe):
+    """
+    Deferred-job form of generate_validated_gpt_recipe: the GPT recipe as 'result'
+    and whether it is the stored fallback. best_recipe is not modified.
+    """
+    recipe = dict(best_recipe)
+    gpt_recipe = generate_validated_gpt_recipe(recipe)
+    return {"result": gpt_recipe, "fallback": bool(recipe.get('fallback'))}
 
 def validate_gpt_instructions(instructions):
     """
@@ -0,0 +1,157 @@
+import os
+import sys
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import time
+import numpy as np
+import pandas as pd
+from src.data.load_data import read_dataset, reviews_dataset_path, review_path
+from src.utils.index_version import publish_index_version, current_index_version
+from src.utils.atomic_files import save_npy_atomic
+from src.utils.recipe_store import load_recipe_ids, recipe_row, recipe_rows_for, record_alignment, check_alignment
+
+review_aggregates_path = "data/processed/review_aggregates.npy"
+
+# Per-recipe aggregate record, one per recipe store row
+aggregate_dtype = np.dtype([
+    ('count', np.uint32),
+    ('mean_rating', np.float32),
+    ('score', np.float32)
+])
+
+_review_aggregates = None
+_review_aggregates_version = None
+_default_review_score = None
+_warned_missing = False
+
+def aggregate_reviews(half_life_days=365, prior_weight=5.0, batch_size=100_000):
+    """
+    Read the three review columns once (partitioned dataset or raw file) and compute,
+    for every recipe store row, the number of reviews, the mean rating and a
+    recency-weighted score.
+    The score is a recency-weighted mean rating shrunk towards the global mean,
+    so recipes with a couple of old reviews don't outrank well-reviewed ones.
+    """
+    num_recipes = len(load_recipe_ids())
+    counts = np.zeros(num_recipes, dtype=np.float64)
+    rating_sums = np.zeros(num_recipes, dtype=np.float64)
+    weight_sums = np.zeros(num_recipes, dtype=np.float64)
+    weighted_sums = np.zeros(num_recipes, dtype=np.float64)
+
+    now = time.time()
+    decay = np.log(2) / (half_life_days * 86400)
+
+    reviews = read_dataset(reviews_dataset_path, review_path, columns=['RecipeId', 'Rating', 'DateSubmitted'])
+    # Batches keep the temporary per-review arrays small
+    for start in range(0, len(reviews), batch_size):
+        batch = reviews.iloc[start:start + batch_size]
+        recipe_ids = batch['RecipeId'].to_numpy()
+        ratings = pd.to_numeric(batch['Rating'], errors='coerce').to_numpy(dtype=np.float64)
+        submitted = pd.to_datetime(batch['DateSubmitted'], errors='coerce', utc=True)
+        submitted = submitted.dt.tz_localize(None).to_numpy().astype('datetime64[s]')
+
+        rows = recipe_rows_for(recipe_ids)
+        known = (rows >= 0) & ~np.isnan(ratings)
+        rows, ratings, submitted = rows[known], ratings[known], submitted[known]
+
+        # Reviews without a date get the weight of the oldest possible review
+        dated = ~np.isnat(submitted)
+        seconds = np.where(dated, submitted.astype(np.int64), 0).astype(np.float64)
+        age = np.where(dated, np.maximum(now - seconds, 0), np.inf)
+        weights = np.exp(-decay * age)
+
+        counts += np.bincount(rows, minlength=num_recipes)
+        rating_sums += np.bincount(rows, weights=ratings, minlength=num_recipes)
+        weight_sums += np.bincount(rows, weights=weights, minlength=num_recipes)
+        weighted_sums += np.bincount(rows, weights=weights * ratings, minlength=num_recipes)
+
+    global_mean = rating_sums.sum() / max(counts.sum(), 1)
+
+    aggregates = np.zeros(num_recipes, dtype=aggregate_dtype)
+    aggregates['count'] = counts
+    aggregates['mean_rating'] = np.divide(rating_sums, counts, out=np.zeros_like(counts), where=counts > 0)
+    aggregates['score'] = (weighted_sums + prior_weight * global_mean) / (weight_sums + prior_weight)
+    return aggregates
+
+def save_review_aggregates(aggregates):
+    """
+    Save the aggregate table so it can be memory-mapped by the serving processes,
+    replacing the previous file atomically.
+    """
+    save_npy_atomic(review_aggregates_path, aggregates)
+    record_alignment(review_aggregates_path)
+    print(f"Review aggregates saved for {len(aggregates)} recipes.")
+
+def load_review_aggregates():
+    """
+    Memory-map the aggregate table, again when a new index version is published,
+    or return None if it hasn't been built.
+    """
+    global _review_aggregates, _review_aggregates_version, _default_review_score
+    version = current_index_version()
+    if _review_aggregates is None or version != _review_aggregates_version:
+        _review_aggregates = _default_review_score = None
+        if os.path.exists(review_aggregates_path):
+            check_alignment(review_aggregates_path)
+            _review_aggregates = np.load(review_aggregates_path, mmap_mode='r')
+        _review_aggregates_version = version
+    return _review_aggregates
+
+def default_review_score(aggregates):
+    """
+    Score of a recipe without reviews: the global mean rating scaled to [0, 1],
+    which is also what unreviewed rows of the table hold.
+    """
+    global _default_review_score
+    if _default_review_score is None:
+        counts = aggregates['count'].astype(np.float64)
+        total = counts.sum()
+        global_mean = (counts * aggregates['mean_rating']).sum() / total if total else 0.0
+        _default_review_score = float(global_mean) / 5.0
+    return _default_review_score
+
+def get_review_score(recipe_id):
+    """
+    Return the recency-weighted rating score of a recipe scaled to [0, 1], in O(1),
+    or None if the aggregates haven't been built. Recipes missing from the table
+    get the global mean, like unreviewed ones.
+    """
+    aggregates = load_review_aggregates()
+    if aggregates is None:
+        return None
+    row = recipe_row(recipe_id)
+    if row < 0 or row >= len(aggregates):
+        return default_review_score(aggregates)
+    return float(aggregates[row]['score']) / 5.0
+
+def parse_rating_weight(value):
+    """
+    Validate a request's rating_weight: a number in [0, 1]. Raises ValueError.
+    """
+    if value is None:
+        return 0.0
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+        raise ValueError("rating_weight must be a number between 0 and 1")
+    return float(value)
+
+def blend_review_score(similarity, recipe_id, rating_weight):
+    """
+    Blend a retrieval similarity with the review score of the recipe. Without the
+    aggregate table the similarity is returned unchanged.
+    """
+    global _warned_missing
+    if not rating_weight:
+        return similarity
+    review_score = get_review_score(recipe_id)
+    if review_score is None:
+        if not _warned_missing:
+            print("Review aggregates not built, rating_weight is ignored.")
+            _warned_missing = True
+        return similarity
+    return (1 - rating_weight) * similarity + rating_weight * review_score
+
+if __name__ == "__main__":
+    aggregates = aggregate_reviews()
+    save_review_aggregates(aggregates)
+    publish_index_version()
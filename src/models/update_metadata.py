@@ -11,6 +11,10 @@ import pandas as pd
 from sentence_transformers import SentenceTransformer
 from pinecone import Pinecone
 from src.utils.config import PINECONE_API_KEY
+from src.utils.index_version import publish_index_version
+from src.models.ann_index import add_to_ann_index
+from src.models.vector_search import embedding_ids_path, build_embedding_matrix
+from src.utils.recipe_store import save_recipe_text_store
 
 # Initialize Pinecone
 pc = Pinecone(api_key=PINECONE_API_KEY)
@@ -75,7 +79,9 @@ def save_new_embeddings_data(recipes):
 
 async def update_metadata_in_pinecone_async(index, recipes, batch_size=1000, namespace="recipes"):
     """
-    Update Pinecone with new vectors based on ingredients asynchronously and include metadata like name, instructions, ingredients, and total_time.
+    Update Pinecone with new vectors based on ingredients asynchronously.
+    Only the small fields used for filtering are stored as metadata; the full recipe
+    text lives in the local recipe text store.
     """
     total_recipes = len(recipes)
 
@@ -87,25 +93,8 @@ async def update_metadata_in_pinecone_async(index, recipes, batch_size=1000, nam
             # Use the embedding vector (already in list format)
             ingredient_vector = row['ingredient_embeddings']
 
-            # Extract and format ingredients
-            ingredients = row["RecipeIngredientParts"]
-            if isinstance(ingredients, np.ndarray):
-                ingredients = ingredients.tolist()  # Convert to list if it's an ndarray
-            if isinstance(ingredients, list):
-                ingredients = ", ".join(ingredients)  # Convert list to comma-separated string
-
-            # Extract and convert instructions to string
-            instructions = row.get("RecipeInstructions", "")
-            if isinstance(instructions, np.ndarray):  # Convert ndarray to string if needed
-                instructions = " ".join(instructions)
-            elif not isinstance(instructions, str):
-                instructions = str(instructions)
-
-            # Prepare metadata update (keeping existing name, ingredients, total_time, and adding instructions)
+            # Slim metadata: name, ingredients and instructions are hydrated locally
             metadata = {
-                "name": row["Name"],
-                "ingredients": ingredients,  # Ensure it's a string
-                "instructions": instructions,  # Add the instructions to the metadata
                 "total_time": row.get("TotalTimeMinutes", 0)  # Handle missing total_time
             }
 
@@ -135,10 +124,27 @@ if __name__ == "__main__":
     #model = SentenceTransformer('all-MiniLM-L6-v2')
     recipes = generate_ingredient_embeddings_parallel(recipes)
 
+    # Recipes already in the embedding matrix, which the ANN indexes are built from
+    indexed_ids = np.load(embedding_ids_path) if os.path.exists(embedding_ids_path) else np.empty(0, dtype=np.int64)
+    new_recipes = recipes[~recipes['RecipeId'].astype(np.int64).isin(indexed_ids)]
+
     # Save the new embeddings data
     save_new_embeddings_data(recipes)
 
+    # Refresh the local text store used to hydrate search results; the row order
+    # is owned by the recipe store (recipe_store.py) and is not rewritten here
+    save_recipe_text_store(recipes)
+
+    # Refresh the exact embedding matrix and insert only the new recipes into the
+    # persisted approximate indexes, so both serve the same corpus
+    build_embedding_matrix()
+    if len(new_recipes):
+        add_to_ann_index(new_recipes['RecipeId'].to_numpy(), new_recipes['ingredient_embeddings'])
+
     # Update Pinecone with new vectors and metadata
     asyncio.run(update_metadata_in_pinecone_async(index, recipes, batch_size=1000))
 
+    # Publish the new index version so serving processes drop cached responses
+    publish_index_version()
+
 
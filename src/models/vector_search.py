@@ -0,0 +1,267 @@
+import os
+import sys
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(project_root)
+
+import atexit
+import heapq
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from src.utils.recipe_store import recipe_rows_for, get_recipe_metadata
+from src.utils.admission import admit
+from src.utils.index_version import current_index_version
+from src.utils.atomic_files import save_npy_atomic
+
+# Embeddings saved by update_metadata.save_new_embeddings_data
+embeddings_output_path = "data/processed/recipes_with_embeddings.parquet"
+embedding_matrix_path = "data/processed/embedding_matrix.npy"
+embedding_ids_path = "data/processed/embedding_ids.npy"
+
+# "pinecone" (remote index), "local" (exact single-process scan), "sharded"
+# (exact scan split across worker processes) or "ann" (approximate index, see ann_index.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+SEARCH_SHARDS = int(os.getenv("SEARCH_SHARDS", os.cpu_count() or 1))
+
+# Scores are always computed in blocks starting at multiples of SCORE_BLOCK, so
+# every backend runs the same BLAS call on the same rows and gets the same floats
+SCORE_BLOCK = 8192
+
+_embedding_matrix = None
+_embedding_version = None
+_sharded_searcher = None
+
+def build_embedding_matrix():
+    """
+    Stack the stored embeddings into a row-normalized float32 matrix sorted by RecipeId.
+    """
+    embeddings = pd.read_parquet(embeddings_output_path, columns=['RecipeId', 'ingredient_embeddings'])
+    embeddings = embeddings.sort_values('RecipeId')
+
+    matrix = np.vstack(embeddings['ingredient_embeddings'].to_numpy()).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms > 0, norms, 1)
+
+    save_npy_atomic(embedding_matrix_path, matrix)
+    save_npy_atomic(embedding_ids_path, embeddings['RecipeId'].astype(np.int64).to_numpy())
+    print(f"Embedding matrix saved: {matrix.shape[0]} recipes x {matrix.shape[1]} dimensions.")
+
+def load_embedding_matrix():
+    """
+    Memory-map the normalized embedding matrix and its RecipeIds, again when a new
+    index version is published.
+    """
+    global _embedding_matrix, _embedding_version
+    version = current_index_version()
+    if _embedding_matrix is None or version != _embedding_version:
+        _embedding_matrix = (
+            np.load(embedding_matrix_path, mmap_mode='r'),
+            np.load(embedding_ids_path, mmap_mode='r')
+        )
+        _embedding_version = version
+    return _embedding_matrix
+
+def normalize_query(vector):
+    query = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    return query / norm if norm > 0 else query
+
+def score_rows(matrix, query, start, stop):
+    """
+    Cosine scores of rows [start, stop) against a normalized query.
+    """
+    scores = np.empty(stop - start, dtype=np.float32)
+    for block_start in range(start, stop, SCORE_BLOCK):
+        block_stop = min(block_start + SCORE_BLOCK, stop)
+        scores[block_start - start:block_stop - start] = matrix[block_start:block_stop] @ query
+    return scores
+
+def top_k_rows(scores, top_k, offset=0):
+    """
+    Return the top_k (score, row) pairs, ordered by score and then by row.
+    """
+    if len(scores) > top_k:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        # Keep every row tied with the k-th score so the tie-break by row is exact
+        threshold = scores[candidates].min()
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((candidates, -scores[candidates]))[:top_k]
+    return [(float(scores[i]), int(i + offset)) for i in candidates[order]]
+
+def exact_search(query, top_k):
+    """
+    Exact top-k over the whole matrix in the current process.
+    """
+    matrix, _ = load_embedding_matrix()
+    return top_k_rows(score_rows(matrix, query, 0, matrix.shape[0]), top_k)
+
+_worker_matrix = None
+
+def _attach_worker(shm_name, shape, dtype):
+    global _worker_matrix, _worker_shm
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_matrix = np.ndarray(shape, dtype=dtype, buffer=_worker_shm.buf)
+    try:
+        # One BLAS thread per worker: the parallelism comes from the shards
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+def _search_shard(args):
+    query, start, stop, top_k = args
+    return top_k_rows(score_rows(_worker_matrix, query, start, stop), top_k, offset=start)
+
+class ShardedSearcher:
+    """
+    Exact top-k search with the embedding matrix held once in shared memory and
+    split into row shards scanned by a pool of worker processes. The partial
+    top-k lists are merged with a heap, so results are identical to exact_search.
+    The RecipeIds of the rows are kept with the copy, as the files may be replaced.
+    """
+
+    def __init__(self, matrix, num_shards=SEARCH_SHARDS, embedding_ids=None):
+        self.shape = matrix.shape
+        self.embedding_ids = None if embedding_ids is None else np.array(embedding_ids)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        shared = np.ndarray(matrix.shape, dtype=np.float32, buffer=self._shm.buf)
+        shared[:] = matrix
+
+        # Shard boundaries fall on SCORE_BLOCK multiples (see score_rows)
+        num_blocks = -(-matrix.shape[0] // SCORE_BLOCK)
+        num_shards = max(1, min(num_shards, num_blocks))
+        block_bounds = np.linspace(0, num_blocks, num_shards + 1).astype(int)
+        self.shards = [
+            (int(start) * SCORE_BLOCK, min(int(stop) * SCORE_BLOCK, matrix.shape[0]))
+            for start, stop in zip(block_bounds[:-1], block_bounds[1:])
+            if stop > start
+        ]
+
+        # Never fork the serving process: it already runs threads (upstream hedging,
+        # job workers, torch). Workers start from a clean forkserver, or are spawned,
+        # and only attach to the shared matrix by name. Only this module is preloaded,
+        # never __main__, which would import the whole app into the forkserver.
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([__name__])
+        else:
+            context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(
+            processes=len(self.shards),
+            initializer=_attach_worker,
+            initargs=(self._shm.name, matrix.shape, np.float32)
+        )
+
+    def search(self, query, top_k):
+        partials = self._pool.map(_search_shard, [(query, start, stop, top_k) for start, stop in self.shards])
+        return heapq.nlargest(top_k, (hit for partial in partials for hit in partial),
+                              key=lambda hit: (hit[0], -hit[1]))
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+        self._shm.close()
+        self._shm.unlink()
+
+def get_sharded_searcher():
+    """
+    Return the process-wide sharded searcher, starting its workers on first use.
+    """
+    global _sharded_searcher
+    if _sharded_searcher is None:
+        matrix, embedding_ids = load_embedding_matrix()
+        _sharded_searcher = ShardedSearcher(matrix, embedding_ids=embedding_ids)
+        atexit.register(_sharded_searcher.close)
+    return _sharded_searcher
+
+def start_vector_backend():
+    """
+    Start the configured backend's workers at startup rather than from the first
+    request that needs them. Does nothing in the workers themselves, which re-import
+    the app when they are spawned.
+    """
+    if multiprocessing.parent_process() is not None:
+        return
+    if VECTOR_BACKEND == "sharded":
+        get_sharded_searcher()
+
+def _rows_to_recipe_ids(hits, embedding_ids=None):
+    if embedding_ids is None:
+        _, embedding_ids = load_embedding_matrix()
+    return [(score, int(embedding_ids[row])) for score, row in hits]
+
+def build_matches(hits, include_metadata=True):
+    """
+    Turn (score, RecipeId) pairs into Pinecone-style match dicts, hydrated with
+    the recipe store metadata.
+    """
+    recipe_ids = [recipe_id for _, recipe_id in hits]
+    matches = [{"id": str(recipe_id), "score": score, "metadata": {}} for score, recipe_id in hits]
+
+    if include_metadata and matches:
+        store_rows = recipe_rows_for(recipe_ids)
+        known = [i for i, row in enumerate(store_rows) if row >= 0]
+        for i, metadata in zip(known, get_recipe_metadata(store_rows[known])):
+            matches[i]["metadata"] = metadata
+    return matches
+
+def search_vectors(vector, top_k, include_metadata=True, backend=None):
+    """
+    Top-k nearest recipes for an embedding, as Pinecone-style match dicts
+    ({'id', 'score', 'metadata'}), using the configured backend.
+    With include_metadata=False local backends skip hydration and Pinecone returns
+    only the slim filtering fields; callers hydrate the final results themselves.
+    """
+    # Held for the whole query, so a slow backend can't take every worker
+    with admit("retrieval"):
+        backend = backend or VECTOR_BACKEND
+        if backend == "pinecone":
+            from src.utils.upstream import get_pinecone_index, call_pinecone
+            query_response = call_pinecone(
+                get_pinecone_index().query,
+                vector=np.asarray(vector, dtype=np.float32).tolist(),
+                top_k=top_k,
+                include_metadata=True,
+                namespace="recipes"
+            )
+            # Plain dicts, so matches can be serialized in responses
+            return [
+                {"id": match['id'], "score": match['score'], "metadata": dict(match['metadata'] or {})}
+                for match in query_response['matches']
+            ]
+
+        query = normalize_query(vector)
+        if backend == "sharded":
+            searcher = get_sharded_searcher()
+            hits = _rows_to_recipe_ids(searcher.search(query, top_k), searcher.embedding_ids)
+        elif backend == "local":
+            hits = _rows_to_recipe_ids(exact_search(query, top_k))
+        elif backend == "ann":
+            from src.models.ann_index import search_ann
+            hits = search_ann(query, top_k)
+        else:
+            raise ValueError(f"Unknown vector backend: {backend}")
+        return build_matches(hits, include_metadata)
+
+def fetch_vector(recipe_id, backend=None):
+    """
+    Return the stored embedding of a recipe, or None if it isn't indexed.
+    """
+    backend = backend or VECTOR_BACKEND
+    if backend == "pinecone":
+        from src.utils.upstream import get_pinecone_index, call_pinecone
+        recipe_data = call_pinecone(get_pinecone_index().fetch, [str(recipe_id)], namespace="recipes")
+        vector = recipe_data['vectors'].get(str(recipe_id))
+        return np.array(vector['values']) if vector else None
+
+    matrix, embedding_ids = load_embedding_matrix()
+    row = int(np.searchsorted(embedding_ids, int(recipe_id)))
+    if row < len(embedding_ids) and embedding_ids[row] == int(recipe_id):
+        return np.asarray(matrix[row])
+    return None
+
+if __name__ == "__main__":
+    build_embedding_matrix()
@@ -0,0 +1,110 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+class Overloaded(Exception):
+    """
+    Raised when a stage bulkhead sheds a request: its wait queue is full or no
+    slot freed up before the wait deadline.
+    """
+
+    def __init__(self, stage, reason):
+        super().__init__(f"The {stage} stage is overloaded ({reason}), try again later")
+        self.stage = stage
+        self.reason = reason
+
+class Bulkhead:
+    """
+    Concurrency limit for one pipeline stage. At most 'max_concurrent' calls run
+    at once, at most 'max_queued' wait for a slot, and a waiting call is shed
+    after 'max_wait' seconds, so a slow stage can't hold every worker thread.
+    """
+
+    def __init__(self, name, max_concurrent, max_queued, max_wait):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._stats = {"admitted": 0, "shed_queue_full": 0, "shed_timeout": 0, "peak_waiting": 0}
+
+    def _acquire(self):
+        with self._condition:
+            if self._active < self.max_concurrent and self._waiting == 0:
+                self._active += 1
+                self._stats["admitted"] += 1
+                return
+
+            if self._waiting >= self.max_queued:
+                self._stats["shed_queue_full"] += 1
+                raise Overloaded(self.name, "queue full")
+
+            self._waiting += 1
+            self._stats["peak_waiting"] = max(self._stats["peak_waiting"], self._waiting)
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["shed_timeout"] += 1
+                        raise Overloaded(self.name, f"no slot within {self.max_wait}s")
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            self._stats["admitted"] += 1
+
+    def _release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def admit(self):
+        """
+        Hold a slot of the stage for the duration of the block, or raise Overloaded.
+        """
+        self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update(active=self._active, waiting=self._waiting, max_concurrent=self.max_concurrent,
+                         max_queued=self.max_queued, max_wait=self.max_wait)
+        return stats
+
+def _bulkhead_from_env(name, max_concurrent, max_queued, max_wait):
+    prefix = name.upper()
+    return Bulkhead(
+        name,
+        max_concurrent=int(os.getenv(f"{prefix}_CONCURRENCY", max_concurrent)),
+        max_queued=int(os.getenv(f"{prefix}_QUEUE_SIZE", max_queued)),
+        max_wait=float(os.getenv(f"{prefix}_MAX_WAIT", max_wait))
+    )
+
+# One bulkhead per stage of the request pipeline, tunable per deployment.
+# Generation waits the least: when it is full the app answers with retrieval-only results.
+bulkheads = {
+    "embedding": _bulkhead_from_env("embedding", max_concurrent=4, max_queued=16, max_wait=1.0),
+    "retrieval": _bulkhead_from_env("retrieval", max_concurrent=8, max_queued=32, max_wait=1.0),
+    "generation": _bulkhead_from_env("generation", max_concurrent=4, max_queued=8, max_wait=0.5),
+}
+
+def admit(stage):
+    """
+    Context manager holding a slot of the given stage's bulkhead.
+    """
+    return bulkheads[stage].admit()
+
+def admission_stats():
+    """
+    Active calls, queue depth and shed counts of every stage.
+    """
+    return {name: bulkhead.stats() for name, bulkhead in bulkheads.items()}
@@ -0,0 +1,19 @@
+import os
+import numpy as np
+
+def temp_path(path):
+    """
+    Sibling temporary path for an artifact, keeping its extension so numpy and
+    scipy don't append another one. Written then moved over the artifact with
+    os.replace, so processes that have the old file mapped keep reading it.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.tmp-{os.getpid()}{ext}"
+
+def save_npy_atomic(path, array):
+    """
+    np.save to a temporary file, then atomically replace the artifact.
+    """
+    tmp_path = temp_path(path)
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
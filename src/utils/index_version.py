@@ -0,0 +1,51 @@
+import os
+import json
+import time
+import uuid
+
+# Written by the jobs that (re)build the embedding index, read by the serving processes
+index_version_path = "data/processed/index_version.json"
+
+_cached_version = None
+_cached_mtime = None
+_checked_at = 0.0
+
+def publish_index_version():
+    """
+    Publish a new embedding-index version. Serving processes pick it up on their
+    next check and drop everything derived from the previous index.
+    """
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    tmp_path = index_version_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "published_at": time.time()}, f)
+    os.replace(tmp_path, index_version_path)
+    print(f"Index version {version} published.")
+    return version
+
+def current_index_version(check_interval=1.0):
+    """
+    Return the current embedding-index version. The version file is stat'ed at
+    most once per check_interval seconds and only re-read when it changed.
+    """
+    global _cached_version, _cached_mtime, _checked_at
+    now = time.monotonic()
+    if _cached_version is not None and now - _checked_at < check_interval:
+        return _cached_version
+    _checked_at = now
+
+    try:
+        mtime = os.stat(index_version_path).st_mtime_ns
+    except FileNotFoundError:
+        _cached_version, _cached_mtime = "unversioned", None
+        return _cached_version
+
+    if mtime != _cached_mtime:
+        try:
+            with open(index_version_path, encoding="utf-8") as f:
+                _cached_version = json.load(f)["version"]
+            _cached_mtime = mtime
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading index version: {e}")
+            _cached_version = _cached_version or "unversioned"
+    return _cached_version
@@ -0,0 +1,117 @@
+import time
+import uuid
+import queue
+import itertools
+import threading
+from collections import OrderedDict
+
+class JobQueueFull(Exception):
+    """
+    Raised when the job queue can't accept more work.
+    """
+
+class JobQueue:
+    """
+    Bounded pool of worker threads running deferred jobs from a priority queue
+    (lower number runs first). Results are kept in a bounded local store for
+    'result_ttl' seconds so clients can poll or wait for them.
+    """
+
+    def __init__(self, num_workers=4, max_queued=256, max_results=1024, result_ttl=600):
+        self.num_workers = num_workers
+        self.max_results = max_results
+        self.result_ttl = result_ttl
+        self._queue = queue.PriorityQueue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._workers = []
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    def _start_workers(self):
+        # Workers are started on first use so importing the app stays cheap
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, fn, *args, priority=10, **kwargs):
+        """
+        Queue fn(*args, **kwargs) and return its job ID.
+        """
+        self._start_workers()
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "status": "queued", "result": None, "error": None,
+               "submitted_at": time.time(), "finished_at": None, "done": threading.Event()}
+        with self._lock:
+            self._evict()
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait((priority, next(self._sequence), job_id, fn, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+                self._stats["rejected"] += 1
+            raise JobQueueFull("The job queue is full")
+        with self._lock:
+            self._stats["submitted"] += 1
+        return job_id
+
+    def _run(self):
+        while True:
+            _, _, job_id, fn, args, kwargs = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            job["status"] = "running"
+            try:
+                job["result"] = fn(*args, **kwargs)
+                job["status"] = "done"
+                outcome = "completed"
+            except Exception as e:
+                print(f"Error running job {job_id}: {e}")
+                job["error"] = str(e)
+                job["status"] = "failed"
+                outcome = "failed"
+            job["finished_at"] = time.time()
+            job["done"].set()
+            with self._lock:
+                self._stats[outcome] += 1
+
+    def _evict(self):
+        # Drop expired results, then the oldest finished jobs beyond max_results.
+        # Called with the lock held on every submit, get and stats
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] and now - job["finished_at"] > self.result_ttl]:
+            del self._jobs[job_id]
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished_at"]]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_results)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id, wait=0):
+        """
+        Return the public state of a job, waiting up to 'wait' seconds for it to
+        finish. Returns None for unknown or expired jobs.
+        """
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if wait > 0:
+            job["done"].wait(wait)
+        return {key: job[key] for key in ("id", "status", "result", "error")}
+
+    def stats(self):
+        with self._lock:
+            self._evict()
+            stats = dict(self._stats)
+            stats["stored"] = len(self._jobs)
+        stats["queued"] = self._queue.qsize()
+        stats["workers"] = self.num_workers
+        return stats
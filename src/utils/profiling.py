@@ -0,0 +1,207 @@
+import os
+import sys
+import hmac
+import time
+import uuid
+import random
+import threading
+import tracemalloc
+from collections import Counter
+import numpy as np
+from flask import request, jsonify, g
+
+# Everything here is opt-in: unless PROFILING_ENABLED is set, register_profiling
+# adds no hooks and no routes, so requests pay nothing
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))  # percentage of requests
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Required (as the PROFILE_HEADER or X-Debug-Token value) to profile a request on
+# demand or use the /debug endpoints; without it only PROFILE_SAMPLE_RATE applies
+PROFILE_DEBUG_TOKEN = os.getenv("PROFILE_DEBUG_TOKEN")
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval from a background thread
+    and aggregates the samples as folded stacks ("frame;frame;frame count"),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+def dump_folded_stacks(samples, label):
+    """
+    Write folded stacks to PROFILE_DIR and return the file path.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
+
+def _object_size(value):
+    """
+    Resident size in bytes of the large objects the app keeps around, or None for
+    anything that isn't worth reporting.
+    """
+    module = type(value).__module__ or ""
+    if module.startswith("pandas") and hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if isinstance(value, np.memmap):
+        # Backed by the page cache, only the pages touched are resident
+        return None
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if module.startswith("scipy.sparse") and hasattr(value, "indptr"):
+        return int(value.data.nbytes + value.indices.nbytes + value.indptr.nbytes)
+    if hasattr(value, "parameters") and callable(value.parameters):
+        try:
+            return int(sum(p.numel() * p.element_size() for p in value.parameters()))
+        except Exception:
+            return None
+    if isinstance(value, (tuple, list)) and value and len(value) <= 16:
+        sizes = [_object_size(item) for item in value]
+        sizes = [size for size in sizes if size]
+        return sum(sizes) if sizes else None
+    if isinstance(value, dict) and value and all(isinstance(item, np.ndarray) for item in value.values()):
+        return int(sum(item.nbytes for item in value.values()))
+    return None
+
+def largest_objects(top_n=20):
+    """
+    Report the largest module-level objects of the app (DataFrames, models, indexes).
+    """
+    objects = []
+    for module_name, module in list(sys.modules.items()):
+        if not (module_name.startswith(("src.", "models.", "utils.")) or module_name in ("__main__", "app")):
+            continue
+        for name, value in list(vars(module).items()):
+            if name.startswith("__"):
+                continue
+            size = _object_size(value)
+            if size:
+                objects.append({"name": f"{module_name}.{name}", "type": type(value).__name__, "bytes": size})
+    objects.sort(key=lambda obj: obj["bytes"], reverse=True)
+    return objects[:top_n]
+
+_previous_snapshot = None
+
+def start_tracemalloc():
+    """
+    Start tracing allocations and take the baseline snapshot.
+    """
+    global _previous_snapshot
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(25)
+        _previous_snapshot = tracemalloc.take_snapshot()
+    return {"status": "started"}
+
+def tracemalloc_report(top_n=20):
+    """
+    Take a tracemalloc snapshot and compare it with the previous one.
+    """
+    global _previous_snapshot
+    if not tracemalloc.is_tracing():
+        return {"status": "stopped"}
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    report = {
+        "status": "tracing",
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "top": [str(stat) for stat in snapshot.statistics('lineno')[:top_n]],
+        "diff": [str(stat) for stat in snapshot.compare_to(_previous_snapshot, 'lineno')[:top_n]]
+                if _previous_snapshot is not None else [],
+    }
+    _previous_snapshot = snapshot
+    return report
+
+def _has_token(value):
+    return bool(PROFILE_DEBUG_TOKEN) and hmac.compare_digest(value or "", PROFILE_DEBUG_TOKEN)
+
+def _stop_sampler():
+    sampler = g.pop('stack_sampler', None)
+    if sampler is None:
+        return None
+    return dump_folded_stacks(sampler.stop(), (request.endpoint or "unknown").replace(".", "_"))
+
+def register_profiling(app):
+    """
+    Add the request sampling hooks to the app, only when PROFILING_ENABLED is set,
+    and the /debug endpoints only when PROFILE_DEBUG_TOKEN is set too.
+    """
+    if not PROFILING_ENABLED:
+        return
+
+    @app.before_request
+    def start_profiling():
+        if _has_token(request.headers.get(PROFILE_HEADER)) or random.random() * 100 < PROFILE_SAMPLE_RATE:
+            g.stack_sampler = StackSampler(threading.get_ident())
+            g.stack_sampler.start()
+
+    @app.after_request
+    def stop_profiling(response):
+        path = _stop_sampler()
+        if path is not None:
+            response.headers["X-Profile-Dump"] = path
+        return response
+
+    @app.teardown_request
+    def stop_profiling_on_error(exception):
+        # after_request is skipped when the view raises, the sampler must still stop
+        _stop_sampler()
+
+    if not PROFILE_DEBUG_TOKEN:
+        return
+
+    @app.before_request
+    def require_debug_token():
+        if request.path.startswith('/debug/') and not _has_token(request.headers.get('X-Debug-Token')):
+            return jsonify({"error": "Forbidden"}), 403
+
+    @app.route('/debug/tracemalloc', methods=['GET', 'POST', 'DELETE'])
+    def debug_tracemalloc():
+        global _previous_snapshot
+        if request.method == 'POST':
+            return jsonify(start_tracemalloc()), 200
+        if request.method == 'DELETE':
+            tracemalloc.stop()
+            _previous_snapshot = None
+            return jsonify({"status": "stopped"}), 200
+        return jsonify(tracemalloc_report(int(request.args.get('top', 20)))), 200
+
+    @app.route('/debug/memory')
+    def debug_memory():
+        return jsonify(largest_objects(int(request.args.get('top', 20)))), 200
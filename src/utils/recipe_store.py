@@ -0,0 +1,222 @@
+import os
+import json
+import mmap
+import hashlib
+import numpy as np
+from src.utils.index_version import publish_index_version, current_index_version
+from src.utils.atomic_files import temp_path, save_npy_atomic
+
+# Every compiled artifact (ingredient matrix, review aggregates, nutrition index...)
+# is aligned with the row order of the cleaned recipes file.
+recipes_cleaned_path = "data/processed/recipes_cleaned.parquet"
+recipe_ids_path = "data/processed/recipe_ids.npy"
+recipe_rows_path = "data/processed/recipe_rows.npy"
+# Local key-value store with the full recipe text, used to hydrate final results
+recipe_text_path = "data/processed/recipe_text.bin"
+recipe_text_offsets_path = "data/processed/recipe_text_offsets.npy"
+
+_recipe_index = None
+_recipe_index_version = None
+_recipe_text_store = None
+_recipe_text_version = None
+_store_signature = None
+
+def save_recipe_ids(recipes):
+    """
+    Save the RecipeId of every row and a direct-address RecipeId -> row table.
+    Files are replaced atomically; serving processes switch on the next version.
+    """
+    global _recipe_index, _store_signature
+    recipe_ids = recipes['RecipeId'].astype(np.int64).to_numpy()
+    recipe_rows = np.full(int(recipe_ids.max()) + 1, -1, dtype=np.int32)
+    recipe_rows[recipe_ids] = np.arange(len(recipe_ids), dtype=np.int32)
+
+    save_npy_atomic(recipe_ids_path, recipe_ids)
+    save_npy_atomic(recipe_rows_path, recipe_rows)
+    _recipe_index = _store_signature = None
+    print(f"Recipe store index saved for {len(recipe_ids)} recipes.")
+
+def _load_recipe_index():
+    # Ids and rows are swapped together when a new index version is published
+    global _recipe_index, _recipe_index_version, _store_signature
+    version = current_index_version()
+    if _recipe_index is None or version != _recipe_index_version:
+        _recipe_index = (
+            np.load(recipe_ids_path, mmap_mode='r'),
+            np.load(recipe_rows_path, mmap_mode='r')
+        )
+        _recipe_index_version = version
+        _store_signature = None
+    return _recipe_index
+
+def load_recipe_ids():
+    """
+    Return the memory-mapped RecipeId of every row of the recipe store.
+    """
+    return _load_recipe_index()[0]
+
+def _load_recipe_rows():
+    return _load_recipe_index()[1]
+
+def recipe_row(recipe_id):
+    """
+    Return the recipe store row of a RecipeId in O(1), or -1 if it is unknown.
+    """
+    recipe_rows = _load_recipe_rows()
+    try:
+        recipe_id = int(float(recipe_id))
+    except (TypeError, ValueError):
+        return -1
+    if recipe_id < 0 or recipe_id >= len(recipe_rows):
+        return -1
+    return int(recipe_rows[recipe_id])
+
+def recipe_rows_for(recipe_ids):
+    """
+    Vectorized version of recipe_row for an array of RecipeIds.
+    """
+    recipe_rows = _load_recipe_rows()
+    recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+    rows = np.full(len(recipe_ids), -1, dtype=np.int32)
+    known = (recipe_ids >= 0) & (recipe_ids < len(recipe_rows))
+    rows[known] = recipe_rows[recipe_ids[known]]
+    return rows
+
+def recipe_store_signature():
+    """
+    Row count and checksum of the recipe store row order, recorded by every
+    artifact aligned with it.
+    """
+    global _store_signature
+    if _store_signature is None:
+        recipe_ids = np.ascontiguousarray(load_recipe_ids())
+        _store_signature = {
+            "rows": int(len(recipe_ids)),
+            "sha256": hashlib.sha256(recipe_ids.tobytes()).hexdigest()
+        }
+    return _store_signature
+
+def _alignment_path(artifact_path):
+    return os.path.splitext(artifact_path)[0] + ".alignment.json"
+
+def record_alignment(artifact_path):
+    """
+    Record next to an artifact the recipe store signature it was built against.
+    """
+    path = _alignment_path(artifact_path)
+    with open(temp_path(path), "w", encoding="utf-8") as f:
+        json.dump(recipe_store_signature(), f)
+    os.replace(temp_path(path), path)
+
+def check_alignment(artifact_path):
+    """
+    Raise RuntimeError if an artifact was built against another recipe store row
+    order than the current one, e.g. after recipe_ids.npy was rewritten.
+    """
+    path = _alignment_path(artifact_path)
+    if not os.path.exists(path):
+        print(f"Warning: no alignment record for '{artifact_path}', rebuild it to enable the check.")
+        return
+    with open(path, encoding="utf-8") as f:
+        recorded = json.load(f)
+    if recorded != recipe_store_signature():
+        raise RuntimeError(
+            f"'{artifact_path}' was built for another recipe store ({recorded['rows']} rows), rebuild it."
+        )
+
+def recipe_text_record(recipe):
+    """
+    Name, ingredients and instructions of a recipe row as display strings.
+    """
+    ingredients = recipe['RecipeIngredientParts']
+    if isinstance(ingredients, np.ndarray):
+        ingredients = ingredients.tolist()
+    if isinstance(ingredients, list):
+        ingredients = ", ".join(ingredients)
+
+    instructions = recipe['RecipeInstructions']
+    if isinstance(instructions, np.ndarray):
+        instructions = " ".join(instructions)
+    elif not isinstance(instructions, str):
+        instructions = str(instructions)
+
+    return {
+        "name": recipe['Name'],
+        "ingredients": ingredients,
+        "instructions": instructions
+    }
+
+def save_recipe_text_store(recipes):
+    """
+    Write the full text of every recipe as one JSON record per recipe store row in
+    a flat file, plus the byte offsets of each record. The recipes must be in
+    recipe store row order.
+    """
+    if not np.array_equal(recipes['RecipeId'].astype(np.int64).to_numpy(), load_recipe_ids()):
+        raise ValueError("Recipes are not in recipe store row order, rebuild the recipe store first.")
+
+    # Written aside and moved into place: serving processes map the current files
+    offsets = np.zeros(len(recipes) + 1, dtype=np.int64)
+    text_path = temp_path(recipe_text_path)
+    with open(text_path, "wb") as f:
+        for i, (_, recipe) in enumerate(recipes.iterrows()):
+            record = json.dumps(recipe_text_record(recipe), ensure_ascii=False).encode("utf-8")
+            f.write(record)
+            offsets[i + 1] = offsets[i] + len(record)
+    os.replace(text_path, recipe_text_path)
+    save_npy_atomic(recipe_text_offsets_path, offsets)
+    record_alignment(recipe_text_path)
+    print(f"Recipe text store saved for {len(recipes)} recipes.")
+
+def build_recipe_store():
+    """
+    Build the recipe store from the cleaned recipes file: its row order, which every
+    other compiled artifact is aligned with, and the text store. Run it first; the
+    ingredient matrix, nutrition index and review aggregates are rebuilt after it.
+    """
+    import pandas as pd
+    recipes = pd.read_parquet(
+        recipes_cleaned_path, columns=['RecipeId', 'Name', 'RecipeIngredientParts', 'RecipeInstructions']
+    )
+    save_recipe_ids(recipes)
+    save_recipe_text_store(recipes)
+
+def _load_recipe_text_store():
+    # Text and offsets are swapped together, and remapped when a new index version
+    # is published; readers holding the previous pair keep a consistent view
+    global _recipe_text_store, _recipe_text_version
+    version = current_index_version()
+    if _recipe_text_store is None or version != _recipe_text_version:
+        check_alignment(recipe_text_path)
+        with open(recipe_text_path, "rb") as f:
+            recipe_text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _recipe_text_store = (recipe_text, np.load(recipe_text_offsets_path, mmap_mode='r'))
+        _recipe_text_version = version
+    return _recipe_text_store
+
+def get_recipe_metadata(rows):
+    """
+    Return name, ingredients and instructions for the given recipe store rows,
+    read from the memory-mapped text store.
+    """
+    recipe_text, offsets = _load_recipe_text_store()
+    return [
+        json.loads(recipe_text[int(offsets[row]):int(offsets[row + 1])])
+        for row in rows
+    ]
+
+def hydrate_matches(matches):
+    """
+    Fill in the full recipe text of the final search matches, keyed by RecipeId.
+    The vector index only carries the small fields used for filtering and ranking.
+    """
+    rows = [recipe_row(match['id']) for match in matches]
+    known = [i for i, row in enumerate(rows) if row >= 0]
+    for i, metadata in zip(known, get_recipe_metadata([rows[i] for i in known])):
+        matches[i]['metadata'] = dict(matches[i].get('metadata') or {}, **metadata)
+    return matches
+
+if __name__ == "__main__":
+    # python -m src.utils.recipe_store, from the project root
+    build_recipe_store()
+    publish_index_version()
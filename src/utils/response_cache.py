@@ -0,0 +1,139 @@
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from src.utils.index_version import current_index_version
+
+try:
+    import redis
+except ImportError:  # The shared tier is optional
+    redis = None
+
+def normalize_ingredients(ingredients):
+    """
+    Lower-case, whitespace-collapse, deduplicate and sort an ingredient list. Views
+    run retrieval and generation on this form, so equal cache keys mean equal answers.
+    """
+    if not isinstance(ingredients, list):
+        return ingredients
+    return sorted({" ".join(str(item).lower().split()) for item in ingredients})
+
+def canonicalize_payload(payload):
+    """
+    Normalize a request payload so that requests asking the same thing share a key:
+    ingredient lists are lower-cased, deduplicated and sorted, names are lower-cased
+    and the cache opt-out flag is ignored.
+    """
+    canonical = {}
+    for key, value in (payload or {}).items():
+        if key == 'cache':
+            continue
+        if key == 'ingredients':
+            value = normalize_ingredients(value)
+        elif key == 'recipe_name' and isinstance(value, str):
+            value = " ".join(value.lower().split())
+        canonical[key] = value
+    return canonical
+
+class ResponseCache:
+    """
+    Two-tier cache of full endpoint responses, keyed by endpoint + canonical payload
+    and tagged with the embedding-index version.
+    - Local tier: bounded in-process LRU, cleared when the index version changes,
+      whose entries also expire after 'local_ttl' seconds.
+    - Shared tier: optional Redis, entries expire on their own and old versions are
+      never read again because the version is part of the key.
+    """
+
+    def __init__(self, max_entries=1024, shared_url=None, shared_ttl=3600, local_ttl=None):
+        self.max_entries = max_entries
+        self.shared_ttl = shared_ttl
+        self.local_ttl = shared_ttl if local_ttl is None else local_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "bypassed": 0, "invalidations": 0}
+
+        self.shared = None
+        if shared_url:
+            if redis is None:
+                print("RESPONSE_CACHE_URL is set but redis is not installed; shared tier disabled.")
+            else:
+                self.shared = redis.Redis.from_url(shared_url)
+
+    def _current_version(self):
+        version = current_index_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if self._version is not None:
+                        self._stats["invalidations"] += 1
+                    self._entries.clear()
+                    self._version = version
+        return version
+
+    def make_key(self, endpoint, payload):
+        canonical = json.dumps(canonicalize_payload(payload), sort_keys=True, separators=(',', ':'))
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return f"aicook:{self._current_version()}:{endpoint}:{digest}"
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self._stats["local_hits"] += 1
+                    return value
+                del self._entries[key]
+
+        if self.shared is not None:
+            try:
+                raw = self.shared.get(key)
+            except Exception as e:
+                print(f"Error reading shared response cache: {e}")
+                raw = None
+            if raw is not None:
+                value = tuple(json.loads(raw))
+                self._store_local(key, value)
+                with self._lock:
+                    self._stats["shared_hits"] += 1
+                return value
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        self._store_local(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, json.dumps(value), ex=self.shared_ttl)
+            except Exception as e:
+                print(f"Error writing shared response cache: {e}")
+
+    def _store_local(self, key, value):
+        with self._lock:
+            # Drop entries computed against an index version that is no longer current
+            if not key.startswith(f"aicook:{self._version}:"):
+                return
+            self._entries[key] = (time.monotonic() + self.local_ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_bypass(self):
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        stats["index_version"] = self._version
+        stats["shared_tier"] = self.shared is not None
+        return stats
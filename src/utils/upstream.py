@@ -0,0 +1,213 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import openai
+import requests
+from requests.adapters import HTTPAdapter
+from pinecone import Pinecone
+from src.utils.config import PINECONE_API_KEY
+
+# Per-stage deadlines (seconds) and pool sizes, tunable per deployment
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 30))
+PINECONE_TIMEOUT = float(os.getenv("PINECONE_TIMEOUT", 2))
+PINECONE_HEDGE_DELAY = float(os.getenv("PINECONE_HEDGE_DELAY", 0.3))
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", 32))
+
+class UpstreamError(Exception):
+    """
+    Raised when an upstream call fails, times out or its circuit is open.
+    """
+
+class LatencyStats:
+    """
+    Call counts and a sliding window of latencies for one upstream.
+    """
+
+    def __init__(self, window=1024):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.rejected = 0
+
+    def record(self, seconds, error=False, timeout=False):
+        with self._lock:
+            self.calls += 1
+            self._latencies.append(seconds)
+            if error:
+                self.errors += 1
+            if timeout:
+                self.timeouts += 1
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {"calls": self.calls, "errors": self.errors, "timeouts": self.timeouts,
+                     "hedges": self.hedges, "rejected": self.rejected}
+        for name, quantile in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            stats[name] = latencies[min(int(quantile * len(latencies)), len(latencies) - 1)] * 1000 if latencies else None
+        return stats
+
+class CircuitBreaker:
+    """
+    Opens after 'failure_threshold' consecutive failures and rejects calls for
+    'reset_timeout' seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+latency_stats = {"openai": LatencyStats(), "pinecone": LatencyStats()}
+circuit_breakers = {"openai": CircuitBreaker(), "pinecone": CircuitBreaker()}
+
+# Keep-alive connection pool shared by every OpenAI call of the process
+_openai_session = requests.Session()
+_openai_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_POOL_SIZE))
+openai.requestssession = _openai_session
+openai.api_key = os.getenv("OPENAI_API_KEY")
+
+_pinecone_client = None
+_pinecone_indexes = {}
+_pinecone_lock = threading.Lock()
+_hedge_executor = ThreadPoolExecutor(max_workers=UPSTREAM_POOL_SIZE, thread_name_prefix="upstream")
+
+def get_pinecone_index(index_name="recipe-embeddings"):
+    """
+    Return the process-wide Pinecone index handle, sharing one connection pool.
+    """
+    global _pinecone_client
+    with _pinecone_lock:
+        if _pinecone_client is None:
+            _pinecone_client = Pinecone(api_key=PINECONE_API_KEY, pool_threads=UPSTREAM_POOL_SIZE)
+        if index_name not in _pinecone_indexes:
+            _pinecone_indexes[index_name] = _pinecone_client.Index(index_name, pool_threads=UPSTREAM_POOL_SIZE)
+        return _pinecone_indexes[index_name]
+
+def _call(upstream, fn, timeout=False):
+    """
+    Run a single upstream call through its circuit breaker and latency stats.
+    """
+    stats = latency_stats[upstream]
+    breaker = circuit_breakers[upstream]
+    if not breaker.allow():
+        stats.count("rejected")
+        raise UpstreamError(f"{upstream} circuit is open")
+
+    start = time.perf_counter()
+    try:
+        result = fn()
+    except Exception as e:
+        stats.record(time.perf_counter() - start, error=True)
+        breaker.record_failure()
+        raise UpstreamError(f"{upstream} call failed: {e}") from e
+    stats.record(time.perf_counter() - start)
+    breaker.record_success()
+    return result
+
+def chat_completion(deadline=OPENAI_TIMEOUT, **kwargs):
+    """
+    openai.ChatCompletion.create with a deadline, pooled connections and a circuit breaker.
+    """
+    return _call("openai", lambda: openai.ChatCompletion.create(request_timeout=deadline, **kwargs))
+
+def call_pinecone(method, *args, deadline=PINECONE_TIMEOUT, hedge_delay=PINECONE_HEDGE_DELAY, **kwargs):
+    """
+    Call a Pinecone index method with a deadline. If the first attempt hasn't
+    answered after 'hedge_delay' seconds a second identical request is sent and
+    the first successful answer wins. The logical call counts once in the stats and
+    the circuit breaker, however many attempts it took.
+    """
+    stats = latency_stats["pinecone"]
+    breaker = circuit_breakers["pinecone"]
+    if not breaker.allow():
+        stats.count("rejected")
+        raise UpstreamError("pinecone circuit is open")
+
+    started = time.monotonic()
+
+    def submit_attempt():
+        # Each attempt only gets the time left before the overall deadline
+        request_timeout = max(deadline - (time.monotonic() - started), 0.001)
+        return _hedge_executor.submit(method, *args, _request_timeout=request_timeout, **kwargs)
+
+    pending = {submit_attempt()}
+    done, pending = wait(pending, timeout=hedge_delay)
+    if not done:
+        stats.count("hedges")
+        pending.add(submit_attempt())
+
+    error = None
+    while True:
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            stats.record(time.monotonic() - started)
+            breaker.record_success()
+            return result
+        remaining = deadline - (time.monotonic() - started)
+        if not pending or remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+    timed_out = bool(pending)
+    stats.record(time.monotonic() - started, error=True, timeout=timed_out)
+    breaker.record_failure()
+    if timed_out:
+        raise UpstreamError(f"pinecone call exceeded its {deadline}s deadline")
+    raise UpstreamError(f"pinecone call failed: {error}") from error
+
+def upstream_stats():
+    """
+    Per-upstream latency percentiles, error counts and circuit state.
+    """
+    return {
+        name: dict(latency_stats[name].snapshot(), circuit=circuit_breakers[name].state)
+        for name in latency_stats
+    }